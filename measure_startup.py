@@ -0,0 +1,46 @@
+"""Confronto dei tempi di avvio della GUI (a freddo / a caldo).
+
+Uso:
+    python measure_startup.py dist/v6_3/v6_3.exe      # build onedir (predefinito di v6_3.spec)
+    python measure_startup.py dist/v6_3.exe           # build onefile (CARD_PRINTER_ONEFILE=1)
+    python measure_startup.py python v6_3.py          # sorgenti
+
+Il programma viene lanciato più volte con --measure-startup; i tempi partono dal lancio del processo,
+quindi includono anche l'estrazione dell'exe onefile. La prima esecuzione è davvero "a freddo" solo
+se i file non sono già nella cache del sistema operativo (es. subito dopo un riavvio).
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import time
+
+
+def measure(cmd):
+    start = time.time()
+    result = subprocess.run(cmd + ["--measure-startup"], capture_output=True, text=True, timeout=300)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            data = json.loads(line)
+            return data["window_epoch"] - start, data["ready_epoch"] - start
+    raise RuntimeError(f"Nessun tempo di avvio ricevuto:\n{result.stderr}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", nargs="+", help="comando che avvia l'app")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure(args.command) for _ in range(args.runs)]
+    print(f"{'avvio':<8}{'finestra (s)':>14}{'librerie pronte (s)':>22}")
+    for i, (window, ready) in enumerate(runs):
+        print(f"{'freddo' if i == 0 else 'caldo':<8}{window:>14.2f}{ready:>22.2f}")
+    if len(runs) > 1:
+        warm = runs[1:]
+        print(f"{'mediana caldo':<13}{statistics.median(w for w, _ in warm):>9.2f}"
+              f"{statistics.median(r for _, r in warm):>22.2f}")
+
+
+if __name__ == "__main__":
+    main()
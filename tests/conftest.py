@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def deck(tmp_path):
+    """Mazzo minimo: tre fronti colorati e un logo per il retro"""
+    from PIL import Image
+
+    folder = tmp_path / "carte"
+    folder.mkdir()
+    for i, color in enumerate([(200, 30, 30), (30, 200, 30), (30, 30, 200)], start=1):
+        Image.new("RGB", (118, 172), color).save(folder / f"card{i}.png")
+    logo = tmp_path / "logo.png"
+    Image.new("RGB", (118, 172), (240, 200, 0)).save(logo)
+    return folder, logo
+
+
+@pytest.fixture
+def run_make_pdf(deck, tmp_path):
+    """make_pdf sul mazzo con impostazioni veloci; restituisce (ok, messaggio, percorso del PDF)"""
+    import v6_3
+
+    folder, logo = deck
+
+    def run(pdf_format, name="deck.pdf", **options):
+        output = str(tmp_path / name)
+        options = {"dpi": 50, "card_w": 59, "card_h": 86, "gap": 5, "show_crop_marks": True, "workers": 1,
+                   "include_back": True, "logo_path": str(logo), **options}
+        ok, message = v6_3.make_pdf(str(folder), output, progress_callback=lambda value, text: None,
+                                    pdf_format=pdf_format, **options)
+        return ok, message, output
+
+    return run
+
+
+@pytest.fixture
+def build(run_make_pdf):
+    """Crea il PDF del mazzo nel formato richiesto e ne restituisce il percorso"""
+
+    def build(pdf_format, name="deck.pdf", **options):
+        ok, message, output = run_make_pdf(pdf_format, name, **options)
+        assert ok, message
+        return output
+
+    return build
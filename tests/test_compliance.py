@@ -0,0 +1,17 @@
+import pytest
+
+import v6_3
+
+CHECKED_FORMATS = [name for name, info in v6_3.PDF_FORMATS.items() if info.get("pdfx") or info.get("pdfa")]
+
+
+@pytest.mark.parametrize("pdf_format", CHECKED_FORMATS)
+def test_output_is_compliant(build, pdf_format):
+    assert v6_3.check_pdf_compliance(build(pdf_format), pdf_format) == []
+
+
+def test_standard_pdf_is_not_pdfx4(build):
+    pdfx4 = next(name for name, info in v6_3.PDF_FORMATS.items() if info.get("pdfx") and info["transparency"])
+    problems = v6_3.check_pdf_compliance(build("PDF Standard"), pdfx4)
+    assert "OutputIntent mancante" in problems
+    assert "GTS_PDFXVersion assente dall'XMP" in problems
@@ -0,0 +1,39 @@
+import pytest
+
+import v6_3
+
+FORMATS = ["PDF Standard", "PDF/X-1a (Stampa CMYK)"]
+
+
+@pytest.mark.parametrize("pdf_format", FORMATS)
+@pytest.mark.parametrize("cache", [False, True])
+@pytest.mark.parametrize("preflight", [False, True])
+def test_missing_logo_becomes_a_placeholder(run_make_pdf, tmp_path, pdf_format, cache, preflight):
+    report = {}
+    ok, message, _ = run_make_pdf(pdf_format, logo_path=str(tmp_path / "manca.png"), report=report,
+                                  cache_dir=str(tmp_path / "cache") if cache else None, preflight=preflight)
+    assert ok, message
+    assert "logo retro" in message
+    assert [f["side"] for f in report["failed"]] == ["logo"]
+
+
+@pytest.mark.parametrize("pdf_format", FORMATS)
+def test_missing_logo_aborts_with_abort_policy(run_make_pdf, tmp_path, pdf_format):
+    ok, message, _ = run_make_pdf(pdf_format, logo_path=str(tmp_path / "manca.png"), failed_policy="abort")
+    assert not ok
+    assert "logo retro" in message
+
+
+def test_source_vanished_after_listing(run_make_pdf, tmp_path, monkeypatch):
+    listed = v6_3.list_image_files
+
+    def list_with_ghost(folder, **options):
+        return listed(folder, **options) + [str(tmp_path / "sparita.png")]
+
+    monkeypatch.setattr(v6_3, "list_image_files", list_with_ghost)
+    report = {}
+    ok, message, _ = run_make_pdf("PDF Standard", cache_dir=str(tmp_path / "cache"), report=report,
+                                  failed_policy="skip")
+    assert ok, message
+    assert [(f["card"], f["side"]) for f in report["failed"]] == [(4, "fronte")]
+    assert "3 carte" in message
@@ -0,0 +1,23 @@
+from PIL import Image
+
+import v6_3
+
+
+def test_pillow_fallback_in_index_and_preflight(tmp_path):
+    # Il libvips di pyvips-binary non ha un loader BMP: l'header arriva da Pillow
+    bmp = tmp_path / "carta.bmp"
+    Image.new("RGB", (40, 60), (1, 2, 3)).save(bmp)
+    header = v6_3.read_image_header(str(bmp))
+    assert (header["width"], header["height"]) == (40, 60)
+    entry = v6_3.LibraryIndex(str(tmp_path / "indice.json")).file_info(str(bmp))
+    assert (entry["format"], entry["width"], entry["height"]) == ("bmp", 40, 60)
+    info = v6_3.inspect_image_header(str(bmp), 59, 86)
+    assert info["error"] is None and info["width"] == 40
+
+
+def test_unreadable_header(tmp_path):
+    broken = tmp_path / "rotta.png"
+    broken.write_bytes(b"\x89PNG\r\n\x1a\nnon un png")
+    entry = v6_3.LibraryIndex(str(tmp_path / "indice.json")).file_info(str(broken))
+    assert entry["format"] is None and entry["width"] is None
+    assert v6_3.inspect_image_header(str(broken), 59, 86)["error"]
@@ -0,0 +1,66 @@
+import pytest
+from PIL import Image
+
+import v6_3
+
+
+def test_natural_sort_key():
+    paths = ["mazzo/card10.png", "mazzo/card2.png", "mazzo/Card1.png", "mazzo/card2b.png"]
+    assert sorted(paths, key=v6_3.natural_sort_key) == [
+        "mazzo/Card1.png", "mazzo/card2.png", "mazzo/card2b.png", "mazzo/card10.png"]
+    assert v6_3.order_images(paths, "natural") == sorted(paths, key=v6_3.natural_sort_key)
+
+
+def test_load_decklist(tmp_path):
+    decklist = tmp_path / "deck.txt"
+    decklist.write_text("# Mazzo Royal Paladin\n4 Blaster Blade\n3x Wingal  # trigger\n\n"
+                        "Alfred, Early 2\n1X Llew\n", encoding="utf-8")
+    assert v6_3.load_decklist(str(decklist)) == [
+        ["blaster", "blade"], ["wingal"], ["alfred", "early", "2"], ["llew"]]
+
+
+def test_order_by_decklist(tmp_path):
+    decklist = tmp_path / "deck.txt"
+    decklist.write_text("4 Wingal\n4 Blaster Blade\n", encoding="utf-8")
+    images = ["d/Blaster_Blade-02.png", "d/zz_sconosciuta.png", "d/wingal.png", "d/aa_sconosciuta.png",
+              "d/blaster_blade.png"]
+    # Prima il nome identico, poi quello contenuto nel nome file; le carte assenti in fondo per percorso
+    assert v6_3.order_images(images, "decklist", decklist=str(decklist)) == [
+        "d/wingal.png", "d/Blaster_Blade-02.png", "d/blaster_blade.png", "d/aa_sconosciuta.png",
+        "d/zz_sconosciuta.png"]
+
+
+def test_order_by_folder():
+    images = ["/m/Gold/b.png", "/m/angel/z.png", "/m/a.png", "/m/Angel/A.png"]
+    assert v6_3.order_images(images, "folder") == ["/m/a.png", "/m/Angel/A.png", "/m/angel/z.png", "/m/Gold/b.png"]
+
+
+@pytest.fixture
+def colored_cards(tmp_path, monkeypatch):
+    index = v6_3.LibraryIndex(str(tmp_path / "indice.json"))
+    monkeypatch.setattr(v6_3, "get_library_index", lambda: index)
+
+    def make(colors):
+        paths = []
+        for name, rgb in colors.items():
+            path = str(tmp_path / f"{name}.png")
+            Image.new("RGB", (32, 32), rgb).save(path)
+            paths.append(path)
+        return paths
+
+    return make
+
+
+def test_order_by_color(colored_cards, tmp_path):
+    paths = colored_cards({"a_grigia": (128, 128, 128), "b_blu": (20, 40, 220), "c_bianca": (250, 250, 250),
+                           "d_rossa": (220, 20, 20), "e_verde": (20, 200, 40)})
+    names = [p[len(str(tmp_path)) + 1:-4] for p in v6_3.order_images(paths, "color", workers=2)]
+    # Tinte in ordine rosso → verde → blu, i grigi in fondo per luminosità
+    assert names == ["d_rossa", "e_verde", "b_blu", "a_grigia", "c_bianca"]
+
+
+def test_unreadable_cards_sort_last_by_color(colored_cards, tmp_path):
+    paths = colored_cards({"b_gialla": (230, 220, 20)})
+    broken = tmp_path / "a_rotta.png"
+    broken.write_bytes(b"rotta")
+    assert v6_3.order_images([str(broken)] + paths, "color", workers=1) == paths + [str(broken)]
@@ -0,0 +1,78 @@
+import time
+
+import v6_3
+
+
+def write_files(tmp_path, count, size=100):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"carta{i}.png"
+        path.write_bytes(bytes([i]) * size)
+        paths.append(str(path))
+    return paths
+
+
+def settled(reader):
+    """Attende che i thread di lettura si fermino sul budget e restituisce (file, byte) in memoria"""
+    last = None
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        with reader.cond:
+            state = (len(reader.buffers), reader.buffered_bytes, reader.next_index)
+        if state == last:
+            return state[:2]
+        last = state
+        time.sleep(0.05)
+    raise AssertionError("lettura anticipata mai ferma")
+
+
+def test_byte_budget(tmp_path):
+    paths = write_files(tmp_path, 10)
+    with v6_3.ReadAhead(paths, max_bytes=250, max_files=100, io_threads=1) as reader:
+        # Si legge finché il budget non è raggiunto: l'ultimo file può superarlo
+        assert settled(reader) == (3, 300)
+        assert reader.take(paths[0]) == bytes([0]) * 100
+        assert settled(reader) == (3, 300)
+        for i, path in enumerate(paths[1:], start=1):
+            assert reader.take(path) == bytes([i]) * 100
+    assert reader.stats["files"] == 10 and reader.stats["bytes"] == 1000
+
+
+def test_file_budget(tmp_path):
+    paths = write_files(tmp_path, 10)
+    with v6_3.ReadAhead(paths, max_bytes=10 ** 9, max_files=4, io_threads=1) as reader:
+        assert settled(reader) == (4, 400)
+        reader.take(paths[0])
+        reader.take(paths[1])
+        assert settled(reader) == (4, 400)
+
+
+def test_file_larger_than_budget_still_passes(tmp_path):
+    paths = write_files(tmp_path, 3, size=1000)
+    with v6_3.ReadAhead(paths, max_bytes=10, io_threads=1) as reader:
+        assert settled(reader) == (1, 1000)
+        assert [len(reader.take(p)) for p in paths] == [1000, 1000, 1000]
+
+
+def test_failed_read_returns_none(tmp_path):
+    paths = write_files(tmp_path, 2)
+    missing = str(tmp_path / "sparita.png")
+    with v6_3.ReadAhead([paths[0], missing, paths[1]], io_threads=1) as reader:
+        assert reader.take(paths[0]) == bytes([0]) * 100
+        assert reader.take(missing) is None
+        assert reader.take(paths[1]) == bytes([1]) * 100
+        # Un file non previsto si legge dal percorso
+        assert reader.take(str(tmp_path / "altro.png")) is None
+
+
+def test_close_mid_run(tmp_path):
+    paths = write_files(tmp_path, 10)
+    reader = v6_3.ReadAhead(paths, max_bytes=150, io_threads=2)
+    with reader:
+        settled(reader)
+    # Dopo la chiusura nessuno resta bloccato: take non aspetta e i thread escono
+    assert reader.take(paths[9]) is None
+    assert reader.buffers == {}
+    for thread in reader.threads:
+        thread.join(timeout=5)
+        assert not thread.is_alive()
@@ -0,0 +1,151 @@
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+
+import pytest
+
+import v6_3
+
+
+@pytest.fixture
+def service(tmp_path):
+    """Servizio di rendering su una porta libera, con cartella job e cache nel tmp_path"""
+    render = v6_3.RenderService(work_dir=str(tmp_path / "jobs"), workers=2, cache_dir=str(tmp_path / "cache"))
+    server = v6_3.ThreadingHTTPServer(("127.0.0.1", 0), render.make_handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield render, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    render.pool.shutdown()
+
+
+def request(url, method="GET", body=None, content_type="application/json"):
+    """(codice HTTP, corpo) della richiesta; il corpo JSON è già decodificato"""
+    req = urllib.request.Request(url, data=body, method=method, headers={"Content-Type": content_type})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            code, data, kind = response.status, response.read(), response.headers["Content-Type"]
+    except urllib.error.HTTPError as e:
+        code, data, kind = e.code, e.read(), e.headers["Content-Type"]
+    return code, json.loads(data) if kind.startswith("application/json") else data
+
+
+def deck_zip(deck, logo_name="logo.png"):
+    folder, logo = deck
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for name in os.listdir(folder):
+            zf.write(folder / name, name)
+        zf.write(logo, logo_name)
+    return buffer.getvalue()
+
+
+def wait_job(url, job_id):
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        _, info = request(f"{url}/jobs/{job_id}")
+        if info["status"] not in ("queued", "running"):
+            return info
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} non concluso")
+
+
+FAST = "dpi=50&preflight=0&pdf_format=PDF%20Standard"
+
+
+def test_zip_upload_with_fractional_sizes(service, deck):
+    _, url = service
+    code, info = request(f"{url}/jobs?{FAST}&card_w=63.5&card_h=88.9&gap=2.5&include_back=1&logo_path=logo.png",
+                         "POST", deck_zip(deck), "application/zip")
+    assert code == 202, info
+    info = wait_job(url, info["id"])
+    assert info["status"] == "done", info["message"]
+    code, pdf = request(f"{url}/jobs/{info['id']}/result")
+    assert code == 200 and pdf.startswith(b"%PDF")
+    # Il logo caricato non è diventato una carta
+    assert "3 carte" in info["message"]
+
+
+def test_json_values_are_coerced(service, deck):
+    render, url = service
+    folder, _ = deck
+    body = {"image_folder": str(folder), "dpi": "50", "card_w": 63.5, "preflight": False,
+            "pdf_format": "PDF Standard"}
+    code, info = request(f"{url}/jobs", "POST", json.dumps(body).encode())
+    assert code == 202, info
+    assert render.jobs[info["id"]]["params"]["dpi"] == 50
+    assert wait_job(url, info["id"])["status"] == "done"
+
+
+@pytest.mark.parametrize("params", [{"dpi": "tanti"}, {"dpi": [1]}, {"card_w": True}, {"pdf_format": 3},
+                                    {"logo_path": None}, {"colore": 1}, {"pdf_format": "PDF/Z"},
+                                    {"order": "casuale"}, {"image_folder": ""}])
+def test_invalid_json_params_are_rejected(service, params):
+    code, info = request(f"{service[1]}/jobs", "POST", json.dumps({"image_folder": "carte", **params}).encode())
+    assert code == 400
+    assert info["error"]
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b'"testo"', b"null", b"{", b"\xff"])
+def test_invalid_json_body_is_rejected(service, body):
+    code, info = request(f"{service[1]}/jobs", "POST", body)
+    assert code == 400
+    assert info["error"]
+
+
+@pytest.mark.parametrize("query", ["card_w=lungo", "volume_sheets=1.5", "logo_path=../logo.png",
+                                   "decklist=../../etc/passwd"])
+def test_invalid_zip_params_are_rejected(service, deck, query):
+    _, url = service
+    code, _ = request(f"{url}/jobs?{FAST}&{query}", "POST", deck_zip(deck), "application/zip")
+    assert code == 400
+    # Il job rifiutato non lascia cartelle
+    assert os.listdir(service[0].work_dir) == []
+
+
+def test_bad_zip_is_rejected(service):
+    code, _ = request(f"{service[1]}/jobs?{FAST}", "POST", b"non uno zip", "application/zip")
+    assert code == 400
+
+
+def test_upload_path_stays_in_the_archive(tmp_path):
+    images = tmp_path / "immagini"
+    images.mkdir()
+    (images / "logo.png").write_bytes(b"")
+    (tmp_path / "segreto.txt").write_text("x")
+    os.symlink(tmp_path / "segreto.txt", images / "link.txt")
+    assert v6_3.upload_path(str(images), "logo.png") == os.path.realpath(images / "logo.png")
+    for relative in ("../segreto.txt", "link.txt", str(tmp_path / "segreto.txt")):
+        with pytest.raises(ValueError):
+            v6_3.upload_path(str(images), relative)
+
+
+def test_routes(service, deck):
+    _, url = service
+    assert request(f"{url}/altro")[0] == 404
+    assert request(f"{url}/jobs/sconosciuto")[0] == 404
+    assert request(f"{url}/altro", "POST", b"{}")[0] == 404
+    code, info = request(f"{url}/jobs?{FAST}", "POST", deck_zip(deck), "application/zip")
+    assert code == 202
+    job_id = info["id"]
+    assert wait_job(url, job_id)["status"] == "done"
+    assert [job["id"] for job in request(f"{url}/jobs")[1]] == [job_id]
+    assert request(f"{url}/jobs/{job_id}/result?volume=x")[0] == 400
+    assert request(f"{url}/jobs/{job_id}/result?volume=2")[0] == 404
+
+
+def test_delete_job(service, deck):
+    render, url = service
+    _, info = request(f"{url}/jobs?{FAST}", "POST", deck_zip(deck), "application/zip")
+    job_id = info["id"]
+    wait_job(url, job_id)
+    code, info = request(f"{url}/jobs/{job_id}", "DELETE")
+    assert code == 200 and info["removed"]
+    assert not os.path.exists(os.path.join(render.work_dir, job_id))
+    assert request(f"{url}/jobs/{job_id}")[0] == 404
+    assert request(f"{url}/jobs/{job_id}", "DELETE")[0] == 409
@@ -0,0 +1,74 @@
+import pytest
+
+import v6_3
+
+
+class FakeClock:
+    """Sostituisce il modulo time di v6_3: tempo reale e tempo CPU avanzano solo quando il test lo decide"""
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def perf_counter(self):
+        return self.wall
+
+    def process_time(self):
+        return self.cpu
+
+
+CORES = 4
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(v6_3, "time", clock)
+    monkeypatch.setattr(v6_3.os, "cpu_count", lambda: CORES)
+    return clock
+
+
+def run(tuner, clock, rate_of, cpu=0.3, batches=20):
+    """Esegue lotti completi con il throughput dato da rate_of(worker) e la CPU indicata"""
+    for _ in range(batches):
+        if tuner.settled:
+            break
+        cards = max(4, 2 * tuner.current)
+        wall = cards / rate_of(tuner.current)
+        clock.wall += wall
+        clock.cpu += cpu * wall * CORES
+        tuner.record(cards)
+    return [batch["workers"] for batch in tuner.history]
+
+
+def test_climbs_to_the_best_count_and_settles(clock):
+    tuner = v6_3.ConcurrencyTuner(2, 16)
+    steps = run(tuner, clock, lambda w: 10 * w if w <= 6 else 60 - 5 * (w - 6))
+    # Su a gradini (metà dei worker), giù a passi di un quarto, fermo alla seconda inversione
+    assert steps == [2, 3, 4, 6, 9, 7, 6, 5]
+    assert tuner.settled
+    assert tuner.current == tuner.best_workers == 6
+
+
+def test_saturated_cpu_does_not_grow(clock):
+    tuner = v6_3.ConcurrencyTuner(2, 16)
+    steps = run(tuner, clock, lambda w: 10 * w, cpu=1.0)
+    assert steps == [2, 1]
+    assert tuner.settled and tuner.current == 2
+
+
+def test_stops_at_max_workers(clock):
+    tuner = v6_3.ConcurrencyTuner(2, 3)
+    assert run(tuner, clock, lambda w: 10 * w) == [2, 3]
+    assert tuner.settled and tuner.current == 3
+
+
+def test_partial_batches_and_settled_tuner_do_not_measure(clock):
+    tuner = v6_3.ConcurrencyTuner(4, 8)
+    clock.wall += 1
+    tuner.record(7)  # il lotto da 4 worker chiede almeno 8 carte
+    assert tuner.history == []
+    tuner.settled = True
+    clock.wall += 1
+    tuner.record(100)
+    assert tuner.history == [] and tuner.current == 4
@@ -0,0 +1,43 @@
+import pytest
+
+import v6_3
+
+SIZES = {"a": 10, "b": 10, "c": 10, "logo": 5}
+
+
+def split(sheets, **limits):
+    return v6_3.split_volumes(sheets, SIZES.__getitem__, **limits)
+
+
+def test_no_limits_is_one_volume():
+    assert split([["a"], ["b"], ["c"]]) == [[0, 1, 2]]
+
+
+def test_sheet_limit():
+    assert split([["a"], ["b"], ["c"], ["a"], ["b"]], max_sheets=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_size_limit_counts_each_image_once_per_volume():
+    # Il logo ripetuto su ogni retro pesa una volta sola per volume
+    sheets = [["a", "logo"], ["b", "logo"], ["c", "logo"]]
+    assert split(sheets, max_bytes=25) == [[0, 1], [2]]
+    assert split(sheets, max_bytes=24) == [[0], [1], [2]]
+
+
+def test_oversized_sheet_gets_its_own_volume():
+    assert split([["a", "b", "c"], ["a"]], max_bytes=15) == [[0], [1]]
+
+
+def test_both_limits_and_placeholders():
+    # None = segnaposto, non ha dimensione
+    sheets = [["a", None], ["b"], ["c"], [None]]
+    assert split(sheets, max_sheets=3, max_bytes=20) == [[0, 1], [2, 3]]
+
+
+def test_duplex_volumes_keep_whole_sheets(build, tmp_path):
+    pymupdf = pytest.importorskip("pymupdf")
+    # Una carta per pagina: tre fogli retro+fronte, due per volume
+    build("PDF Standard", card_w=150, card_h=220, volume_sheets=2)
+    counts = [pymupdf.open(str(tmp_path / f"deck_vol{n:02}.pdf")).page_count for n in (1, 2)]
+    assert counts == [4, 2]
+    assert not (tmp_path / "deck_vol03.pdf").exists()
@@ -0,0 +1,26 @@
+import pytest
+
+pymupdf = pytest.importorskip("pymupdf")
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_round_trip(build, workers):
+    with pymupdf.open(build("PDF Standard", workers=workers)) as doc:
+        assert not doc.is_repaired
+        assert doc.page_count == 2
+        # Prima il retro: il logo è un solo oggetto immagine, ripetuto sotto ogni carta
+        assert len(doc.get_page_images(0)) == 1
+        fronts = doc.get_page_images(1)
+        assert len(fronts) == 3
+        pixmap = pymupdf.Pixmap(doc, fronts[0][0])
+        assert pixmap.pixel(0, 0)[:3] in {(200, 30, 30), (30, 200, 30), (30, 30, 200)}
+
+
+def test_parallel_write_matches_sequential(build):
+    with pymupdf.open(build("PDF Standard", name="single.pdf", workers=1)) as single, \
+            pymupdf.open(build("PDF Standard", name="parallel.pdf", workers=4)) as parallel:
+        assert not parallel.is_repaired
+        assert single.xref_length() == parallel.xref_length()
+        # La numerazione delle immagini segue l'ordine di completamento dei worker: si confronta il risultato
+        for a, b in zip(single, parallel):
+            assert a.get_pixmap(dpi=20).samples == b.get_pixmap(dpi=20).samples
@@ -1,13 +1,35 @@
 import os
+import sys
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-from fpdf import FPDF
-import pyvips
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import tempfile
 from pathlib import Path
 import json
 import threading
+import hashlib
+import time
+import fnmatch
+import base64
+import io
+import mmap
+import re
+import uuid
+import zlib
+import bisect
+import itertools
+import contextlib
+import queue
+import shutil
+import zipfile
+import argparse
+import colorsys
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from datetime import datetime, timezone
+
+# Riferimento per il tempo di avvio riportato nel report di generazione
+STARTUP_T0 = time.perf_counter()
 
 # ---------------- Parametri ----------------
 CARD_WIDTH_MM = 59
@@ -18,15 +40,148 @@ PAGE_H = 297  # A4 mm
 
 CONFIG_FILE = "card_printer_config.json"
 
+# Cache delle immagini già elaborate (riusate se il sorgente non cambia)
+CACHE_DIR = "card_printer_cache"
+CACHE_MAX_AGE_DAYS = 30
+CACHE_MAX_MB = 8192  # oltre questa dimensione si eliminano i file usati meno di recente
+CACHE_GRACE_S = 600  # i file usati negli ultimi minuti non si toccano (job paralleli del servizio)
+
+# Indice persistente della libreria immagini (scansioni incrementali)
+INDEX_FILE = "card_library_index.json"
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif")
+# Firme (magic bytes) dei formati riconosciuti dal contenuto
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"BM", "bmp"),
+)
+
+# Bozza rapida: bassa risoluzione e JPEG (inserito nel PDF senza ricompressione)
+DRAFT_DPI = 150
+DRAFT_JPEG_QUALITY = 75
+
+# Livello zlib degli stream immagine (0-9): 1 per le bozze, 9 per l'archiviazione
+COMPRESSION_LEVEL_DEFAULT = 6
+DRAFT_COMPRESSION_LEVEL = 1
+
+# Anteprima: miniature minuscole tenute in memoria e riscalate al volo
+PREVIEW_THUMB_HEIGHT = 200
+PREVIEW_WIDTH = 300
+
+# Sotto questa risoluzione effettiva la carta stampata risulta sgranata
+MIN_EFFECTIVE_DPI = 300
+
+# Suffisso dei retro per carta: "nome_back.png" è il retro di "nome.png"
+BACK_SUFFIX = "_back"
+
+# Ordine delle carte nel PDF; colore e lista del mazzo usano l'indice della libreria, mai le immagini elaborate
+ORDER_MODES = {
+    "path": "Percorso",
+    "natural": "Naturale (card2 prima di card10)",
+    "folder": "Cartella (clan/grado)",
+    "color": "Colore dominante",
+    "decklist": "Lista del mazzo",
+}
+COLOR_THUMB_SIZE = 32  # miniatura da cui si calcola il colore medio
+
+# Numero progressivo sotto ogni carta, nell'abbondanza tra le carte (cifre disegnate a tratti, senza font)
+SLUG_DIGIT_MM = 2.0
+SLUG_MIN_DIGIT_MM = 1.0  # con un gap più piccolo il numero non entra e non viene stampato
+
 # Formati PDF disponibili
+# color: "rgb" = immagini lasciate come sono, "icc" = RGB convertito e marcato con profilo sRGB,
+#        "cmyk" = convertito nel profilo CMYK di stampa
+# "pdfx"/"pdfa": identificatori scritti in XMP e Info; "transparency": False se il formato vieta SMask e gruppi di trasparenza
 PDF_FORMATS = {
-    "PDF Standard": {"name": "Standard", "version": "1.4"},
-    "PDF/A-1b (Archiviazione)": {"name": "PDF/A-1b", "version": "1.4"},
-    "PDF/X-1a (Stampa CMYK)": {"name": "PDF/X-1a", "version": "1.3"},
-    "PDF/X-3 (Stampa con profili ICC)": {"name": "PDF/X-3", "version": "1.3"},
-    "PDF/X-4 (Stampa con trasparenze)": {"name": "PDF/X-4", "version": "1.6"},
+    "PDF Standard": {"name": "Standard", "version": "1.4", "color": "rgb", "transparency": True},
+    "PDF/A-1b (Archiviazione)": {"name": "PDF/A-1b", "version": "1.4", "color": "icc", "transparency": False,
+                                 "pdfa": "PDFA_1B"},
+    "PDF/X-1a (Stampa CMYK)": {"name": "PDF/X-1a", "version": "1.4", "color": "cmyk", "transparency": False,
+                               "pdfx": "PDF/X-1a:2003"},
+    "PDF/X-3 (Stampa con profili ICC)": {"name": "PDF/X-3", "version": "1.4", "color": "icc", "transparency": False,
+                                         "pdfx": "PDF/X-3:2003"},
+    "PDF/X-4 (Stampa con trasparenze)": {"name": "PDF/X-4", "version": "1.6", "color": "icc", "transparency": True,
+                                         "pdfx": "PDF/X-4"},
 }
 
+# Lettura anticipata: i file sorgente (es. su NAS) si leggono in RAM prima che i worker li chiedano
+PREFETCH_MB_DEFAULT = 256
+PREFETCH_FILES = 32
+PREFETCH_IO_THREADS = 4
+
+# Carte che non si riescono a elaborare: segnaposto nello slot (l'ordine resta quello della cartella),
+# salto (le carte successive scorrono come nelle versioni precedenti) o interruzione della generazione
+FAILED_CARD_POLICIES = {
+    "placeholder": "Segnaposto nello slot",
+    "skip": "Salta la carta",
+    "abort": "Interrompi la generazione",
+}
+FAILED_CARD_POLICY_DEFAULT = "placeholder"
+
+# Catena di decodifica: libvips sequenziale (veloce), libvips ad accesso casuale tollerante, Pillow
+DECODE_STAGES = ("sequenziale", "casuale", "pillow")
+
+# Cartelle temporanee dei job: una per generazione; quelle orfane (crash) si eliminano all'avvio
+WORKSPACE_PREFIX = "card_printer_job_"
+WORKSPACE_STALE_HOURS = 12
+
+# Thread automatici: si parte da pochi e si cresce finché le carte/s aumentano
+AUTO_WORKERS_START = 2
+AUTO_WORKERS_MAX = min(32, (os.cpu_count() or 4) * 4)
+
+# Servizio di rendering HTTP: di default ascolta solo in locale
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_DIR = "card_printer_jobs"
+
+# Profilo CMYK incluso in libvips; sostituibile con il .icc fornito dalla tipografia
+DEFAULT_CMYK_PROFILE = "cmyk"
+BLEED_MM = 3  # abbondanza attorno alla griglia delle carte (BleedBox)
+
+# Sfondo su cui appiattire le carte trasparenti quando il formato non ammette trasparenze
+ALPHA_BACKGROUND_DEFAULT = "#ffffff"
+
+# Correzione di allineamento fronte-retro (mm, gradi, fattori di scala)
+CALIBRATION_DEFAULT = {"offset_x": 0.0, "offset_y": 0.0, "rotation": 0.0, "scale_x": 1.0, "scale_y": 1.0}
+
+
+# ---------- librerie pesanti ----------
+# pyvips (DLL di libvips) e fpdf2 si caricano alla prima elaborazione, o dal thread di
+# riscaldamento della GUI mentre l'utente sceglie le cartelle: la finestra compare subito
+pyvips = None
+FPDF = OutputIntentSubType = RasterImageInfo = OutputProducer = PDFInfo = PDFICCProfile = None
+PDFDate = builtin_srgb2014_bytes = None
+PrintPDFInfo = PrintOutputProducer = None
+LIBRARY_TIMINGS = {}
+_libraries_lock = threading.Lock()
+
+
+def load_libraries():
+    """Importa pyvips e fpdf2 una sola volta; chiamata in testa a ogni funzione che li usa"""
+    global pyvips, FPDF, OutputIntentSubType, RasterImageInfo, OutputProducer, PDFInfo, PDFICCProfile
+    global PDFDate, builtin_srgb2014_bytes
+    if pyvips is not None:
+        return
+    with _libraries_lock:
+        if pyvips is not None:
+            return
+        start = time.perf_counter()
+        from fpdf import FPDF
+        from fpdf.enums import OutputIntentSubType
+        from fpdf.image_datastructures import RasterImageInfo
+        from fpdf.output import OutputProducer, PDFInfo, PDFICCProfile
+        from fpdf.syntax import PDFDate
+        from fpdf.util import builtin_srgb2014_bytes
+        define_output_classes()
+        import pyvips as vips_module
+        LIBRARY_TIMINGS.update(libraries_s=round(time.perf_counter() - start, 3),
+                               loaded_by=threading.current_thread().name)
+        # Assegnato per ultimo: pyvips non None significa che tutto il resto è pronto
+        pyvips = vips_module
+
 
 # ---------- funzioni utili ----------
 def mm_to_px(mm, dpi):
@@ -45,14 +200,514 @@ def draw_crop_marks(pdf, x, y, w, h, mark_len=3):
     pdf.line(x + w, y + h, x + w, y + h - mark_len)
 
 
-def list_image_files(folder):
-    exts = (".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif")
-    return sorted([entry.path for entry in os.scandir(folder) if entry.is_file() and entry.name.lower().endswith(exts)])
+# Segmenti di una cifra a sette segmenti, in un riquadro 1x1 con l'origine in alto a sinistra
+DIGIT_SEGMENT_LINES = {
+    "a": ((0, 0), (1, 0)), "b": ((1, 0), (1, 0.5)), "c": ((1, 0.5), (1, 1)), "d": ((0, 1), (1, 1)),
+    "e": ((0, 0.5), (0, 1)), "f": ((0, 0), (0, 0.5)), "g": ((0, 0.5), (1, 0.5)),
+}
+DIGIT_SEGMENTS = {
+    "0": "abcdef", "1": "bc", "2": "abged", "3": "abgcd", "4": "fgbc",
+    "5": "afgcd", "6": "afgedc", "7": "abc", "8": "abcdefg", "9": "abcdfg",
+}
+
+
+def draw_index_number(pdf, number, center_x, y, height=SLUG_DIGIT_MM):
+    """Numero della carta disegnato con linee: PDF/X e PDF/A vietano i font non incorporati"""
+    text = str(number)
+    digit_w = height * 0.5
+    spacing = height * 0.3
+    x = center_x - (len(text) * digit_w + (len(text) - 1) * spacing) / 2
+    pdf.set_line_width(0.15)
+    for char in text:
+        for segment in DIGIT_SEGMENTS[char]:
+            (x0, y0), (x1, y1) = DIGIT_SEGMENT_LINES[segment]
+            pdf.line(x + x0 * digit_w, y + y0 * height, x + x1 * digit_w, y + y1 * height)
+        x += digit_w + spacing
 
 
-def process_image_to_temp(img_path, target_w, target_h):
+def draw_placeholder(pdf, x, y, w, h):
+    """Slot di una carta non elaborata: riquadro barrato, solo tratti (nessun font, valido anche in PDF/X)"""
+    pdf.set_line_width(0.3)
+    pdf.rect(x, y, w, h)
+    pdf.line(x, y, x + w, y + h)
+    pdf.line(x + w, y, x, y + h)
+
+
+def sniff_image_format(path):
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(12)
+    except OSError:
+        return None
+    for signature, fmt in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return fmt
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def read_image_header(path):
+    """Legge solo l'header dell'immagine (nessuna decodifica dei pixel): dimensioni, formato, canali e profilo.
+    Come nella catena di decodifica, se libvips non lo riconosce si prova l'header con Pillow;
+    se nessuno dei due ci riesce solleva l'errore di libvips."""
+    load_libraries()
     try:
-        img = pyvips.Image.new_from_file(img_path, access='sequential')
+        img = pyvips.Image.new_from_file(path)
+        return {
+            "width": img.width,
+            "height": img.height,
+            "format": img.get('vips-loader') if img.get_typeof('vips-loader') else None,
+            "bands": img.bands,
+            "alpha": bool(img.hasalpha()),
+            "interpretation": img.interpretation,
+            "icc": img.get_typeof('icc-profile-data') != 0,
+        }
+    except Exception as e:
+        try:
+            from PIL import Image
+            with Image.open(path) as im:
+                return {
+                    "width": im.width,
+                    "height": im.height,
+                    "format": f"pillow:{im.format}",
+                    "bands": len(im.getbands()),
+                    "alpha": "A" in im.getbands() or "transparency" in im.info,
+                    "interpretation": im.mode,
+                    "icc": "icc_profile" in im.info,
+                }
+        except Exception:
+            raise e
+
+
+def scan_dir(dirpath):
+    files, subdirs = [], []
+    for entry in os.scandir(dirpath):
+        if entry.is_file():
+            files.append(entry.name)
+        elif entry.is_dir():
+            subdirs.append(entry.name)
+    return files, subdirs
+
+
+def match_globs(rel_path, patterns):
+    name = os.path.basename(rel_path)
+    return any(fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+
+class LibraryIndex:
+    """Indice della libreria (cartelle, dimensione, data, formato e misure dei file) salvato su disco"""
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self.dirs = {}
+        self.files = {}
+        self.dirty = False
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.dirs = data.get("dirs", {})
+            self.files = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def list_dir(self, dirpath):
+        """Contenuto della cartella; se la sua data di modifica non è cambiata non viene riletta"""
+        mtime = os.stat(dirpath).st_mtime_ns
+        with self.lock:
+            cached = self.dirs.get(dirpath)
+            if cached and cached["mtime"] == mtime:
+                return cached["files"], cached["subdirs"]
+        files, subdirs = scan_dir(dirpath)
+        with self.lock:
+            self.dirs[dirpath] = {"mtime": mtime, "files": files, "subdirs": subdirs}
+            present = {os.path.join(dirpath, name) for name in files}
+            for path in [p for p in self.files if os.path.dirname(p) == dirpath and p not in present]:
+                del self.files[path]
+            self.dirty = True
+        return files, subdirs
+
+    def file_info(self, path):
+        """Formato e dimensioni in pixel, riletti dall'header solo se il file è cambiato"""
+        st = os.stat(path)
+        with self.lock:
+            entry = self.files.get(path)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns:
+            return entry
+        entry = {"size": st.st_size, "mtime": st.st_mtime_ns, "format": sniff_image_format(path),
+                 "width": None, "height": None}
+        if entry["format"]:
+            try:
+                header = read_image_header(path)
+                entry["width"], entry["height"] = header["width"], header["height"]
+            except Exception:
+                entry["format"] = None
+        with self.lock:
+            self.files[path] = entry
+            self.dirty = True
+        return entry
+
+    def card_color(self, path, thumb=None):
+        """Colore medio [r, g, b] della carta, salvato nell'indice; thumb = miniatura già pronta (anteprima)"""
+        entry = self.file_info(path)
+        if entry.get("color"):
+            return entry["color"]
+        try:
+            if thumb is None:
+                load_libraries()
+                thumb = pyvips.Image.thumbnail(path, COLOR_THUMB_SIZE, height=COLOR_THUMB_SIZE)
+            color = average_color(thumb)
+        except Exception:
+            return None
+        with self.lock:
+            entry["color"] = color
+            self.dirty = True
+        return color
+
+    def refresh(self, paths, workers=8):
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return dict(zip(paths, ex.map(self.file_info, paths)))
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            with open(self.path + ".tmp", 'w') as f:
+                json.dump({"dirs": self.dirs, "files": self.files}, f)
+            os.replace(self.path + ".tmp", self.path)
+            self.dirty = False
+
+
+_library_index = None
+_library_index_lock = threading.Lock()
+
+
+def get_library_index():
+    global _library_index
+    with _library_index_lock:
+        if _library_index is None:
+            _library_index = LibraryIndex()
+        return _library_index
+
+
+def list_image_files(folder, recursive=False, include=None, exclude=None, sniff=False, use_index=False,
+                     order="path", decklist=None):
+    """Immagini della cartella (e sottocartelle se recursive), filtrate per estensione o per contenuto,
+    nell'ordine scelto (ORDER_MODES)"""
+    index = get_library_index() if use_index else None
+    include = include or []
+    exclude = exclude or []
+
+    candidates = []
+    pending = [folder]
+    while pending:
+        current = pending.pop()
+        files, subdirs = index.list_dir(current) if index else scan_dir(current)
+        for name in files:
+            path = os.path.join(current, name)
+            rel = os.path.relpath(path, folder).replace(os.sep, "/")
+            if include and not match_globs(rel, include):
+                continue
+            if exclude and match_globs(rel, exclude):
+                continue
+            if sniff or name.lower().endswith(IMAGE_EXTS):
+                candidates.append(path)
+        if recursive:
+            for name in subdirs:
+                path = os.path.join(current, name)
+                if not (exclude and match_globs(os.path.relpath(path, folder).replace(os.sep, "/"), exclude)):
+                    pending.append(path)
+
+    if sniff:
+        if index:
+            infos = index.refresh(candidates)
+            candidates = [p for p in candidates if infos[p]["format"]]
+        else:
+            candidates = [p for p in candidates if sniff_image_format(p)]
+    elif index:
+        index.refresh(candidates)
+    if index:
+        index.save()
+    return order_images(sorted(candidates), order, folder, decklist)
+
+
+def natural_sort_key(path):
+    """Chiave di ordinamento naturale: i numeri nel percorso contano per valore (card2 < card10)"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', path)]
+
+
+def filename_tokens(path):
+    """Parole del nome file in minuscolo: 'Blaster_Blade-2.png' -> ['blaster', 'blade', '2']"""
+    return re.findall(r'[a-z0-9]+', Path(path).stem.lower())
+
+
+def load_decklist(decklist_path):
+    """Nomi delle carte (come parole) nell'ordine della lista; quantità iniziali ('4', '4x') e commenti # ignorati"""
+    names = []
+    with open(decklist_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = re.sub(r'^\s*\d+\s*x?\s+', '', line.split('#')[0], flags=re.IGNORECASE)
+            tokens = re.findall(r'[a-z0-9]+', line.lower())
+            if tokens:
+                names.append(tokens)
+    return names
+
+
+def average_color(thumb):
+    """Colore medio sRGB di una miniatura pyvips"""
+    if thumb.interpretation not in ('srgb', 'b-w'):
+        thumb = thumb.colourspace('srgb')
+    if thumb.hasalpha():
+        thumb = thumb.flatten(background=255)
+    # In memoria: la miniatura è minuscola e la media si calcola su ogni banda separatamente
+    thumb = thumb.copy_memory()
+    bands = [round(thumb[b].avg()) for b in range(min(3, thumb.bands))]
+    return bands * 3 if len(bands) == 1 else bands
+
+
+def hue_sort_key(rgb):
+    """Ordine per tinta (12 settori), poi luminosità; i grigi quasi privi di saturazione vanno in fondo"""
+    hue, lightness, saturation = colorsys.rgb_to_hls(*(c / 255 for c in rgb))
+    if saturation < 0.15:
+        return 1, 0, lightness
+    return 0, round(hue * 12) % 12, lightness
+
+
+def order_images(images, order="path", root=None, decklist=None, workers=8):
+    """Riordina i percorsi senza rielaborare nulla: bastano nome, cartella e colore medio dell'indice"""
+    if order == "natural":
+        return sorted(images, key=natural_sort_key)
+    if order == "folder":
+        if not images:
+            return []
+        root = root or os.path.commonpath(images)
+        return sorted(images, key=lambda p: (os.path.dirname(os.path.relpath(p, root)).lower(), Path(p).name.lower()))
+    if order == "color":
+        index = get_library_index()
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            colors = dict(zip(images, ex.map(index.card_color, images)))
+        index.save()
+        return sorted(images, key=lambda p: (hue_sort_key(colors[p]) if colors[p] else (2, 0, 0), p))
+    if order == "decklist" and decklist:
+        names = [" ".join(tokens) for tokens in load_decklist(decklist)]
+        exact = {}
+        for n, name in enumerate(names):
+            exact.setdefault(name, n)
+
+        def position(path):
+            # Prima il nome identico, poi il nome della lista contenuto nel nome file (es. "blaster_blade_02")
+            tokens = " ".join(filename_tokens(path))
+            if tokens in exact:
+                return exact[tokens]
+            padded = f" {tokens} "
+            return next((n for n, name in enumerate(names) if f" {name} " in padded), len(names))
+
+        # Le carte che non compaiono nella lista restano in fondo, in ordine di percorso
+        return sorted(images, key=lambda p: (position(p), p))
+    return sorted(images)
+
+
+def split_back_images(images, manifest=None):
+    """Separa i fronti dai retro per carta (file con suffisso BACK_SUFFIX).
+    I retro indicati nel manifest non sono fronti anche senza suffisso: non finiscono in nessuna delle due liste."""
+    manifest_backs = {os.path.realpath(back) for back in (manifest or {}).values()}
+    fronts = []
+    backs = {}
+    for path in images:
+        stem = Path(path).stem
+        if stem.lower().endswith(BACK_SUFFIX):
+            backs[stem[:-len(BACK_SUFFIX)].lower()] = path
+        elif os.path.realpath(path) not in manifest_backs:
+            fronts.append(path)
+    return fronts, backs
+
+
+def load_back_manifest(manifest_path):
+    """Manifest JSON {"fronte.png": "retro.png"}; i percorsi relativi partono dalla cartella del manifest"""
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    return {os.path.basename(front).lower(): os.path.join(base, back) for front, back in manifest.items()}
+
+
+def find_card_backs(fronts, backs_by_stem, manifest=None):
+    """Retro di ogni fronte (manifest prima, poi convenzione sul nome); None = logo comune"""
+    manifest = manifest or {}
+    card_backs = []
+    for path in fronts:
+        back = manifest.get(os.path.basename(path).lower()) or backs_by_stem.get(Path(path).stem.lower())
+        card_backs.append(os.path.realpath(back) if back else None)
+    return card_backs
+
+
+# ---------- gestione colore ----------
+def parse_hex_color(value):
+    """"#rrggbb" → (r, g, b); ValueError se il testo non è un colore"""
+    value = value.strip().lstrip('#')
+    if len(value) != 6:
+        raise ValueError(f"Colore non valido: {value}")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+class ColorPipeline:
+    """Conversione ICC eseguita nei worker libvips; i profili sono risolti e letti una sola volta per job"""
+
+    def __init__(self, mode, cmyk_profile=None, intent='relative', flatten=False, background=(255, 255, 255)):
+        load_libraries()
+        self.mode = mode
+        self.intent = intent
+        self.flatten = flatten or mode == "cmyk"  # il CMYK di stampa non ha trasparenze
+        self.background = tuple(background)
+        self.print_profile = cmyk_profile or DEFAULT_CMYK_PROFILE
+        self.output_profile = self.print_profile if mode == "cmyk" else "srgb"
+        # Letto e validato qui, nel thread principale: un profilo sbagliato blocca il job prima dei worker.
+        # I byte servono anche per l'OutputIntent del PDF.
+        self.output_profile_data = None
+        if mode == "cmyk":
+            self.output_profile_data = pyvips.Image.profile_load(self.output_profile)
+        elif mode == "icc":
+            # L'sRGB di libvips è un profilo v4, non ammesso nei PDF 1.4 (PDF/A-1, PDF/X-3):
+            # dopo la conversione le immagini vengono marcate con l'sRGB v2 di fpdf2
+            self.output_profile_data = builtin_srgb2014_bytes()
+
+    def cache_params(self):
+        return (self.mode, self.output_profile, self.intent, self.flatten, self.background)
+
+    def intent_profile(self, pdfx):
+        """Profilo dell'OutputIntent: la condizione di stampa CMYK per PDF/X, sRGB per PDF/A"""
+        if not pdfx:
+            return builtin_srgb2014_bytes(), 3, "DeviceRGB", "sRGB"
+        if self.mode == "cmyk":
+            data = self.output_profile_data
+        else:
+            data = pyvips.Image.profile_load(self.print_profile)
+        return data, 4, "DeviceCMYK", os.path.basename(self.print_profile)
+
+    def resolve_alpha(self, img):
+        """Alfa tutto opaco → eliminato, così fpdf non scrive uno SMask inutile;
+        altrimenti appiattito sullo sfondo se il formato non ammette trasparenze"""
+        if not img.hasalpha():
+            return img
+        # Il controllo legge i pixel e la scrittura li rilegge: con access='sequential' serve una copia in memoria
+        img = img.copy_memory()
+        max_alpha = 65535 if img.format == 'ushort' else 255
+        if img[img.bands - 1].min() >= max_alpha:
+            return img.extract_band(0, n=img.bands - 1)
+        if not self.flatten:
+            return img
+        if img.bands == 2:
+            img = img.colourspace('srgb')
+        return img.flatten(background=[v * max_alpha / 255 for v in self.background])
+
+    def convert(self, img):
+        img = self.resolve_alpha(img)
+        if self.mode == "rgb":
+            return img
+        has_profile = img.get_typeof('icc-profile-data') != 0
+        if not has_profile and img.interpretation in ('b-w', 'grey16'):
+            img = img.colourspace('srgb')
+        # Profilo incorporato se presente, altrimenti sRGB (o CMYK generico per i sorgenti CMYK)
+        fallback = "cmyk" if img.interpretation == 'cmyk' else "srgb"
+        img = img.icc_transform(self.output_profile, input_profile=fallback, embedded=True,
+                                intent=self.intent)
+        if self.mode == "icc":
+            img = img.copy()
+            img.set_type(pyvips.GValue.blob_type, 'icc-profile-data', self.output_profile_data)
+        return img
+
+    def save_format(self):
+        if self.mode == "cmyk":
+            # DeviceCMYK senza profilo incorporato: il profilo di stampa va nell'OutputIntent
+            return ".tif", {"compression": "deflate", "strip": True}
+        if self.mode == "icc":
+            # Il profilo sRGB resta nel PNG e fpdf lo incorpora come ICCBased
+            return ".png", {"compression": 6, "strip": False}
+        return ".png", {"compression": 6, "strip": True}
+
+
+class DecodeStats:
+    """Tempi di elaborazione per formato e per stadio della catena di decodifica (condiviso tra i worker)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.formats = {}
+
+    def record(self, path, stage, seconds, ok):
+        ext = os.path.splitext(path)[1].lower().lstrip('.')
+        fmt = {"jpg": "jpeg", "tif": "tiff"}.get(ext, ext or "?")
+        with self.lock:
+            entry = self.formats.setdefault(fmt, {"files": 0, "seconds": 0.0, "stages": {}})
+            stage_entry = entry["stages"].setdefault(stage, {"ok": 0, "failed": 0, "seconds": 0.0})
+            stage_entry["ok" if ok else "failed"] += 1
+            stage_entry["seconds"] += seconds
+            entry["seconds"] += seconds
+            entry["files"] += 1 if ok else 0
+
+    def summary(self):
+        with self.lock:
+            return {fmt: {"files": entry["files"], "seconds": round(entry["seconds"], 3),
+                          "stages": {stage: {**values, "seconds": round(values["seconds"], 3)}
+                                     for stage, values in entry["stages"].items()}}
+                    for fmt, entry in self.formats.items()}
+
+    def recovered(self):
+        """Immagini decodificate solo da uno stadio successivo al primo"""
+        with self.lock:
+            return sum(values["ok"] for entry in self.formats.values()
+                       for stage, values in entry["stages"].items() if stage != DECODE_STAGES[0])
+
+
+def open_with_pillow(img_path, data=None):
+    """Ultimo stadio della catena: Pillow tollera JPEG troncati e TIFF a 16 bit che libvips rifiuta.
+    L'immagine torna in pyvips a 8 bit RGB/RGBA, così il resto dell'elaborazione non cambia."""
+    from PIL import Image, ImageFile
+    ImageFile.LOAD_TRUNCATED_IMAGES = True
+    with Image.open(io.BytesIO(data) if data is not None else img_path) as im:
+        im.load()
+        icc = im.info.get("icc_profile") if im.mode in ("RGB", "RGBA") else None
+        if im.mode.startswith("I;16") or im.mode == "I":
+            # 16 bit (o interi) -> 8 bit: si scala invece di troncare
+            im = im.point(lambda v: v * (1 / 256)).convert("L")
+        has_alpha = im.mode in ("RGBA", "LA", "PA") or (im.mode == "P" and "transparency" in im.info)
+        im = im.convert("RGBA" if has_alpha else "RGB")
+        img = pyvips.Image.new_from_memory(im.tobytes(), im.width, im.height, len(im.getbands()), 'uchar')
+    if icc:
+        img = img.copy()
+        img.set_type(pyvips.GValue.blob_type, 'icc-profile-data', icc)
+    return img
+
+
+def open_source_image(img_path, stage, data=None):
+    """Apre il sorgente con uno stadio della catena di decodifica"""
+    if stage == "pillow":
+        return open_with_pillow(img_path, data)
+    if stage == "sequenziale":
+        options = {"access": 'sequential'}
+    else:
+        # Accesso casuale e nessun errore su dati troncati o corrotti: più lento, ma legge i file difettosi
+        options = {"access": 'random', "fail_on": 'none'}
+    if data is not None:
+        return pyvips.Image.new_from_buffer(data, "", **options)
+    return pyvips.Image.new_from_file(img_path, **options)
+
+
+def render_card_image(img_path, stage, target_w, target_h, out_path, draft, color, data, temp_dir):
+    """Decodifica, ridimensiona, converte e salva una carta con uno stadio della catena; solleva in caso di errore"""
+    if draft:
+        # Bozza: libvips decodifica direttamente a risoluzione ridotta (shrink-on-load)
+        if stage != "sequenziale":
+            img = open_source_image(img_path, stage, data).thumbnail_image(target_w, height=target_h, size='down')
+        elif data is not None:
+            img = pyvips.Image.thumbnail_buffer(data, target_w, height=target_h, size='down')
+        else:
+            img = pyvips.Image.thumbnail(img_path, target_w, height=target_h, size='down')
+        if img.hasalpha():
+            img = img.flatten(background=255)
+        suffix = ".jpg"
+        save_options = {"Q": DRAFT_JPEG_QUALITY, "strip": True}
+    else:
+        img = open_source_image(img_path, stage, data)
 
         w = img.width
         h = img.height
@@ -61,17 +716,459 @@ def process_image_to_temp(img_path, target_w, target_h):
         if scale < 1.0:
             img = img.thumbnail_image(target_w, height=target_h, size='down')
 
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
+        if color:
+            img = color.convert(img)
+            suffix, save_options = color.save_format()
+        else:
+            suffix = ".png"
+            save_options = {"compression": 6, "strip": True}
+        if not out_path:
+            # Il file temporaneo viene riletto e compresso una volta sola da prepare_pdf_image:
+            # comprimerlo qui significherebbe deflate due volte per ogni carta
+            save_options = dict(save_options, compression="none" if suffix == ".tif" else 0)
+
+    if out_path:
+        # Scrittura atomica: un file interrotto non deve mai sembrare valido in cache
+        # Nome univoco: più job (servizio HTTP) possono elaborare la stessa carta insieme
+        target = f"{out_path}.{os.getpid()}-{threading.get_ident()}.part{suffix}"
+    else:
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=temp_dir)
         tmp.close()
+        target = tmp.name
+    try:
+        img.write_to_file(target, **save_options)
+    except Exception:
+        # Il file scritto a metà non deve restare né essere scambiato per buono dallo stadio successivo
+        with contextlib.suppress(OSError):
+            os.remove(target)
+        raise
+    if out_path:
+        os.replace(target, out_path)
+        return out_path
+    return target
+
+
+def process_image_to_temp(img_path, target_w, target_h, out_path=None, draft=False, color=None, data=None,
+                          temp_dir=None, errors=None, stats=None):
+    """data: contenuto del file già letto dalla lettura anticipata; se manca libvips apre il percorso.
+    Senza out_path il risultato va in temp_dir (la cartella del job) o nella cartella temporanea di sistema.
+    I file sani passano solo dal primo stadio di DECODE_STAGES; gli altri si provano solo dopo un errore.
+    In caso di errore restituisce None e, se errors è un dizionario, vi registra il motivo per img_path."""
+    load_libraries()
+    failures = []
+    for stage in DECODE_STAGES:
+        start = time.perf_counter()
+        try:
+            result = render_card_image(img_path, stage, target_w, target_h, out_path, draft, color, data, temp_dir)
+        except Exception as e:
+            failures.append(f"{stage}: {' '.join(str(e).split()) or type(e).__name__}")
+            if stats:
+                stats.record(img_path, stage, time.perf_counter() - start, ok=False)
+            continue
+        if stats:
+            stats.record(img_path, stage, time.perf_counter() - start, ok=True)
+        if failures:
+            print(f"🩹 {img_path} recuperata con il decoder '{stage}' ({'; '.join(failures)})")
+        return result
+    print(f"⚠️ Errore processing {img_path}: {'; '.join(failures)}")
+    if errors is not None:
+        errors[img_path] = "; ".join(failures)
+    return None
+
+
+# ---------- compressione stream immagine ----------
+PDF_COLOR_SPACES = {1: "DeviceGray", 3: "DeviceRGB", 4: "DeviceCMYK"}
+
+
+def flate_rows(raw, row_bytes, level):
+    """Righe con byte di filtro PNG "None" davanti, compresse Flate (/Predictor 15 come fpdf)"""
+    rows = b"".join(b"\0" + raw[i:i + row_bytes] for i in range(0, len(raw), row_bytes))
+    return zlib.compress(rows, level)
+
+
+def prepare_pdf_image(path, level=COMPRESSION_LEVEL_DEFAULT):
+    """Decodifica l'immagine elaborata e ne prepara lo stream Flate nel worker (zlib rilascia il GIL).
+    Restituisce le info nel formato della cache immagini di fpdf, o None se fpdf deve leggerla da sé."""
+    load_libraries()
+    try:
+        img = pyvips.Image.new_from_file(path, access='sequential')
+        if img.format != 'uchar':
+            img = (img / 257 if img.format == 'ushort' else img).cast('uchar')
+        iccp = img.get('icc-profile-data') if img.get_typeof('icc-profile-data') != 0 else None
+        smask = None
+        if img.hasalpha():
+            img = img.copy_memory()
+            alpha = img[img.bands - 1]
+            smask = flate_rows(alpha.write_to_memory(), img.width, level)
+            img = img.extract_band(0, n=img.bands - 1)
+        bands = img.bands
+        cs = "DeviceCMYK" if img.interpretation == 'cmyk' else PDF_COLOR_SPACES.get(bands)
+        if cs is None:
+            return None
+        info = RasterImageInfo(
+            data=flate_rows(img.write_to_memory(), img.width * bands, level),
+            w=img.width, h=img.height, cs=cs, iccp=iccp, bpc=8, dpn=bands,
+            f="FlateDecode", inverted=False, dp=f"/Predictor 15 /Colors {bands} /Columns {img.width}",
+        )
+        if smask is not None:
+            info["smask"] = smask
+        return info
+    except Exception as e:
+        print(f"⚠️ Compressione non anticipata per {path}: {e}")
+        return None
 
-        img.write_to_file(tmp.name, compression=6, strip=True)
 
-        return tmp.name
-    except Exception as e:
-        print(f"⚠️ Errore processing {img_path}: {e}")
+def prepared_stream_path(image_path, level):
+    """Stream Flate già pronto di un'immagine in cache, per livello di compressione"""
+    return f"{image_path}.z{level}"
+
+
+def save_prepared_stream(path, info):
+    """Salva lo stream accanto all'immagine in cache: riga JSON con le chiavi fpdf, poi i byte"""
+    blobs = {key: info[key] for key in ("data", "smask", "iccp") if info.get(key) is not None}
+    header = {key: info[key] for key in ("w", "h", "cs", "bpc", "dpn", "f", "inverted", "dp")}
+    header["sizes"] = {key: len(blob) for key, blob in blobs.items()}
+    part = f"{path}.{os.getpid()}-{threading.get_ident()}.part"
+    with open(part, 'wb') as f:
+        f.write(json.dumps(header).encode('utf-8') + b"\n")
+        for blob in blobs.values():
+            f.write(blob)
+    os.replace(part, path)
+
+
+def load_prepared_stream(path):
+    """Stream salvato da save_prepared_stream, o None se manca o è illeggibile"""
+    load_libraries()
+    try:
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            sizes = header.pop("sizes")
+            info = RasterImageInfo(**header, iccp=None)
+            for key, size in sizes.items():
+                info[key] = f.read(size)
+                if len(info[key]) != size:
+                    return None
+        os.utime(path)
+        return info
+    except (OSError, ValueError, KeyError):
         return None
 
 
+def register_pdf_image(pdf, name, info):
+    """Inserisce nella cache di fpdf un'immagine già compressa: pdf.image(name) ne copierà i byte"""
+    cache = pdf.image_cache
+    info["i"] = len(cache.images) + 1
+    info["usages"] = 0
+    info["iccp_i"] = None
+    iccp = info.pop("iccp", None)
+    if iccp is not None:
+        # Stessa numerazione di fpdf: ogni profilo distinto viene scritto una volta sola
+        info["iccp_i"] = cache.icc_profiles.setdefault(iccp, len(cache.icc_profiles))
+    info["iccp"] = None
+    cache.images[name] = info
+
+
+# ---------- cache incrementale ----------
+def source_fingerprint(path, *params):
+    """Hash del sorgente (percorso, dimensione, data di modifica) e dei parametri di elaborazione"""
+    st = os.stat(path)
+    key = "|".join(str(v) for v in (os.path.realpath(path), st.st_size, st.st_mtime_ns) + params)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def cached_image_path(cache_dir, cache_key, draft=False, color=None):
+    if draft:
+        suffix = ".jpg"
+    else:
+        suffix = color.save_format()[0] if color else ".png"
+    return os.path.join(cache_dir, cache_key + suffix)
+
+
+def process_image_cached(img_path, target_w, target_h, cache_dir, cache_key, draft=False, color=None, data=None,
+                         errors=None, stats=None):
+    cached = cached_image_path(cache_dir, cache_key, draft, color)
+    if os.path.exists(cached):
+        os.utime(cached)
+        return cached
+    return process_image_to_temp(img_path, target_w, target_h, out_path=cached, draft=draft, color=color, data=data,
+                                 errors=errors, stats=stats)
+
+
+def prune_cache(cache_dir, max_age_days=CACHE_MAX_AGE_DAYS, max_mb=CACHE_MAX_MB):
+    """Elimina i file non usati da max_age_days, poi i meno recenti finché la cache supera max_mb"""
+    now = time.time()
+    limit = now - max_age_days * 86400
+    kept = []
+    for entry in os.scandir(cache_dir):
+        try:
+            if not entry.is_file():
+                continue
+            st = entry.stat()
+            if st.st_mtime < limit:
+                os.remove(entry.path)
+            else:
+                kept.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            pass
+    total = sum(size for _, size, _ in kept)
+    for mtime, size, path in sorted(kept):
+        if total <= max_mb * 1024 * 1024 or mtime > now - CACHE_GRACE_S:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def draft_output_path(output_pdf):
+    root, ext = os.path.splitext(output_pdf)
+    return f"{root}_bozza{ext or '.pdf'}"
+
+
+def volume_output_path(output_pdf, number):
+    root, ext = os.path.splitext(output_pdf)
+    return f"{root}_vol{number:02d}{ext or '.pdf'}"
+
+
+def split_volumes(sheets, image_size, max_sheets=0, max_bytes=0):
+    """Raggruppa i fogli in volumi consecutivi (elenchi di indici); 0 = nessun limite.
+    Le dimensioni sono stimate dalle immagini: ognuna conta una volta per volume, come la scrive fpdf."""
+    volumes, current, seen, size = [], [], set(), 0
+    for idx, files in enumerate(sheets):
+        new = {f for f in files if f and f not in seen}
+        extra = sum(image_size(f) for f in new)
+        if current and ((max_sheets and len(current) >= max_sheets) or (max_bytes and size + extra > max_bytes)):
+            volumes.append(current)
+            current, seen, size = [], set(), 0
+            new = {f for f in files if f}
+            extra = sum(image_size(f) for f in new)
+        current.append(idx)
+        seen |= new
+        size += extra
+    if current:
+        volumes.append(current)
+    return volumes
+
+
+def page_manifest_path(output_pdf):
+    return output_pdf + ".manifest.json"
+
+
+def build_page_manifest(layout, front_keys, back_keys, slots_per_page, include_back):
+    """Per ogni pagina, gli hash dei sorgenti nell'ordine in cui vengono stampati"""
+    pages = []
+    for i in range(0, len(front_keys), slots_per_page):
+        if include_back:
+            pages.append(back_keys[i:i + slots_per_page])
+        pages.append(front_keys[i:i + slots_per_page])
+    return {"layout": layout, "pages": pages}
+
+
+def load_page_manifest(output_pdf):
+    try:
+        with open(page_manifest_path(output_pdf), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def count_changed_pages(old_manifest, new_manifest):
+    if not old_manifest or old_manifest.get("layout") != new_manifest["layout"]:
+        return len(new_manifest["pages"])
+    old_pages = old_manifest.get("pages", [])
+    return sum(1 for i, page in enumerate(new_manifest["pages"]) if i >= len(old_pages) or old_pages[i] != page)
+
+
+# ---------- cartelle temporanee ----------
+class JobWorkspace:
+    """Cartella temporanea di una generazione, da usare con with: alla fine viene eliminata
+    con tutto il contenuto, anche in caso di errore. root può essere un disco RAM (es. /dev/shm)."""
+
+    def __init__(self, root=None):
+        self.root = root or tempfile.gettempdir()
+        self.path = None
+
+    def __enter__(self):
+        os.makedirs(self.root, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix=WORKSPACE_PREFIX, dir=self.root)
+        return self
+
+    def __exit__(self, *exc):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def usage(self):
+        """Byte occupati dai file del job"""
+        total = 0
+        for dirpath, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    pass
+        return total
+
+
+def clean_stale_workspaces(root=None, max_age_hours=WORKSPACE_STALE_HOURS):
+    """Elimina le cartelle dei job rimaste da esecuzioni interrotte; restituisce (cartelle, byte) liberati.
+    L'età è quella dell'ultima modifica: una generazione in corso scrive di continuo nella sua cartella."""
+    root = root or tempfile.gettempdir()
+    cutoff = time.time() - max_age_hours * 3600
+    removed = freed = 0
+    try:
+        entries = [e for e in os.scandir(root) if e.name.startswith(WORKSPACE_PREFIX) and e.is_dir()]
+    except OSError:
+        return 0, 0
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime > cutoff:
+                continue
+            size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(entry.path) for f in files)
+        except OSError:
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+# ---------- lettura anticipata ----------
+class ReadAhead:
+    """Legge in memoria i prossimi file sorgente con thread di I/O dedicati, entro un limite di file e di byte.
+    I worker di elaborazione chiamano take(path) e decodificano dal buffer: su disco lento o rete
+    la CPU non resta ferma ad aspettare le letture, e il numero di letture parallele è indipendente
+    da quello dei thread di calcolo. I file vanno passati nell'ordine in cui verranno chiesti."""
+
+    def __init__(self, paths, max_bytes=PREFETCH_MB_DEFAULT * 1024 * 1024, max_files=PREFETCH_FILES,
+                 io_threads=PREFETCH_IO_THREADS):
+        self.paths = list(paths)
+        self.wanted = set(self.paths)
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.cond = threading.Condition()
+        self.buffers = {}  # path -> bytes, oppure None se la lettura è fallita
+        self.buffered_bytes = 0
+        self.next_index = 0
+        self.closed = False
+        self.stats = {"files": 0, "bytes": 0, "read_s": 0.0, "wait_s": 0.0}
+        self.threads = [threading.Thread(target=self.read_loop, daemon=True, name="card-readahead")
+                        for _ in range(max(1, min(io_threads, len(self.paths))))]
+
+    def __enter__(self):
+        for t in self.threads:
+            t.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.buffers.clear()
+            self.cond.notify_all()
+
+    def read_loop(self):
+        while True:
+            with self.cond:
+                # Si aspetta spazio nel budget; un file più grande del budget passa comunque se la coda è vuota
+                while not self.closed and self.next_index < len(self.paths) and self.buffers and (
+                        len(self.buffers) >= self.max_files or self.buffered_bytes >= self.max_bytes):
+                    self.cond.wait()
+                if self.closed or self.next_index >= len(self.paths):
+                    return
+                path = self.paths[self.next_index]
+                self.next_index += 1
+            start = time.perf_counter()
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                data = None  # il worker riproverà dal percorso e segnalerà l'errore
+            with self.cond:
+                if self.closed:
+                    return
+                self.buffers[path] = data
+                self.buffered_bytes += len(data or b"")
+                self.stats["files"] += 1
+                self.stats["bytes"] += len(data or b"")
+                self.stats["read_s"] += time.perf_counter() - start
+                self.cond.notify_all()
+
+    def take(self, path):
+        """Restituisce il contenuto del file e libera il suo spazio nel budget (None = leggere dal percorso)"""
+        if path not in self.wanted:
+            return None
+        start = time.perf_counter()
+        with self.cond:
+            while path not in self.buffers and not self.closed:
+                self.cond.wait()
+            self.wanted.discard(path)
+            data = self.buffers.pop(path, None)
+            self.buffered_bytes -= len(data or b"")
+            self.stats["wait_s"] += time.perf_counter() - start
+            self.cond.notify_all()
+        return data
+
+
+# ---------- pre-flight ----------
+def inspect_image_header(path, card_w, card_h):
+    """Header dell'immagine con la risoluzione effettiva alla dimensione di stampa; error se illeggibile"""
+    info = {"path": path, "error": None}
+    try:
+        info.update(read_image_header(path))
+    except Exception as e:
+        info["error"] = str(e).strip().splitlines()[0] if str(e).strip() else repr(e)
+        return info
+    # Risoluzione effettiva alla dimensione di stampa scelta
+    info["effective_dpi"] = int(min(info["width"] / (card_w / 25.4), info["height"] / (card_h / 25.4)))
+    return info
+
+
+def preflight_images(images, card_w, card_h, workers, min_dpi=MIN_EFFECTIVE_DPI, executor=None):
+    """Controllo rapido di tutte le immagini prima dell'elaborazione pesante"""
+    pool = contextlib.nullcontext(executor) if executor else ThreadPoolExecutor(max_workers=workers)
+    with pool as ex:
+        infos = list(ex.map(lambda p: inspect_image_header(p, card_w, card_h), images))
+    return {
+        "images": infos,
+        "errors": [i for i in infos if i["error"]],
+        "low_dpi": [i for i in infos if not i["error"] and i["effective_dpi"] < min_dpi],
+    }
+
+
+def format_preflight_report(report, limit=10):
+    lines = [f"Immagini controllate: {len(report['images'])}"]
+    if report["errors"]:
+        lines.append(f"❌ Illeggibili: {len(report['errors'])}")
+        lines += [f"   {os.path.basename(i['path'])}: {i['error']}" for i in report["errors"][:limit]]
+    if report["low_dpi"]:
+        lines.append(f"⚠️ Sotto {MIN_EFFECTIVE_DPI} DPI effettivi: {len(report['low_dpi'])}")
+        lines += [f"   {os.path.basename(i['path'])}: {i['width']}x{i['height']} px, {i['effective_dpi']} DPI"
+                  for i in report["low_dpi"][:limit]]
+    if not report["errors"] and not report["low_dpi"]:
+        lines.append("✅ Nessun problema trovato")
+    return "\n".join(lines)
+
+
+# ---------- anteprima ----------
+def make_preview_thumbnail(path, height=PREVIEW_THUMB_HEIGHT):
+    """Miniatura per l'anteprima: libvips decodifica già ridotto (shrink-on-load), costa pochi ms"""
+    load_libraries()
+    thumb = pyvips.Image.thumbnail(path, height * 4, height=height)
+    if thumb.interpretation not in ('srgb', 'b-w'):
+        thumb = thumb.colourspace('srgb')
+    if thumb.hasalpha():
+        thumb = thumb.flatten(background=255)
+    return thumb.copy_memory()
+
+
+def preview_thumbnail_data(thumb, w_px, h_px):
+    """PNG base64 della miniatura alle dimensioni esatte dello slot (come pdf.image la stira nella carta)"""
+    resized = thumb.resize(w_px / thumb.width, vscale=h_px / thumb.height)
+    return base64.b64encode(resized.write_to_buffer('.png', compression=1))
+
+
 def compute_grid_positions(page_w, page_h, card_w, card_h, gap):
     positions = []
     cols = int((page_w + gap) // (card_w + gap))
@@ -93,8 +1190,75 @@ def compute_grid_positions(page_w, page_h, card_w, card_h, gap):
     return positions
 
 
-def apply_pdf_format(pdf, pdf_format):
-    """Applica metadata e configurazioni specifiche per il formato PDF scelto"""
+def normalize_calibration(calibration):
+    cal = dict(CALIBRATION_DEFAULT)
+    if calibration:
+        for key in CALIBRATION_DEFAULT:
+            if key in calibration:
+                cal[key] = float(calibration[key])
+    return cal
+
+
+def compute_back_positions(positions, card_w, card_h, calibration=None):
+    """Posizioni dei retro (speculari ai fronti) con la correzione di calibrazione già applicata"""
+    cal = normalize_calibration(calibration)
+    cx, cy = PAGE_W / 2, PAGE_H / 2
+
+    back_positions = []
+    for x_f, y_f in positions:
+        x_b = PAGE_W - x_f - card_w
+        back_positions.append((cx + (x_b - cx) * cal["scale_x"] + cal["offset_x"],
+                               cy + (y_f - cy) * cal["scale_y"] + cal["offset_y"]))
+    return back_positions, card_w * cal["scale_x"], card_h * cal["scale_y"]
+
+
+def draw_crosshair(pdf, x, y, size=4):
+    pdf.line(x - size, y, x + size, y)
+    pdf.line(x, y - size, x, y + size)
+
+
+def make_calibration_sheet(output_pdf, card_w, card_h, gap, calibration=None):
+    """Foglio di test fronte-retro: mirini sui centri delle carte e righello in mm sul fronte"""
+    load_libraries()
+    positions = compute_grid_positions(PAGE_W, PAGE_H, card_w, card_h, gap)
+    back_positions, back_w, back_h = compute_back_positions(positions, card_w, card_h, calibration)
+    cal = normalize_calibration(calibration)
+
+    pdf = FPDF(unit='mm', format='A4')
+    pdf.set_auto_page_break(False)
+    pdf.set_font('Helvetica', size=7)
+
+    # RETRO (stesso ordine di make_pdf: prima il retro, poi il fronte)
+    pdf.add_page()
+    with pdf.rotation(cal["rotation"], x=PAGE_W / 2, y=PAGE_H / 2):
+        pdf.set_line_width(0.1)
+        for x_b, y_b in back_positions:
+            pdf.rect(x_b, y_b, back_w, back_h)
+            draw_crosshair(pdf, x_b + back_w / 2, y_b + back_h / 2, size=6)
+
+    # FRONTE
+    pdf.add_page()
+    for x_f, y_f in positions:
+        pdf.set_line_width(0.1)
+        pdf.rect(x_f, y_f, card_w, card_h)
+        draw_crop_marks(pdf, x_f, y_f, card_w, card_h)
+        cx, cy = x_f + card_w / 2, y_f + card_h / 2
+        pdf.set_line_width(0.05)
+        for mm in range(-5, 6):
+            tick = 2 if mm % 5 == 0 else 1
+            pdf.line(cx + mm, cy - tick, cx + mm, cy + tick)
+            pdf.line(cx - tick, cy + mm, cx + tick, cy + mm)
+    pdf.set_xy(10, 5)
+    pdf.cell(0, 4, "Stampa fronte-retro, guarda in controluce e misura di quanto il mirino del retro "
+                   "si discosta dal righello (tacche da 1 mm). Inserisci la correzione nel profilo.")
+
+    pdf.output(output_pdf)
+    return True, f"Foglio di calibrazione creato: {len(positions)} carte per pagina"
+
+
+def apply_pdf_format(pdf, pdf_format, color=None):
+    """Applica metadata e configurazioni specifiche per il formato PDF scelto.
+    Con color (gestione colore attiva) aggiunge anche OutputIntent, XMP e voci Info di PDF/X e PDF/A."""
     format_info = PDF_FORMATS.get(pdf_format, PDF_FORMATS["PDF Standard"])
 
     # Imposta versione PDF
@@ -121,14 +1285,273 @@ def apply_pdf_format(pdf, pdf_format):
         pdf.set_title('Carte Vanguard - Archiviazione')
         pdf.set_subject('PDF/A-1b - Long-term archival')
 
+    if not color:
+        return pdf
+
+    if not format_info["transparency"]:
+        # Niente SMask né gruppi di trasparenza sulle pagine
+        pdf.allow_images_transparency = False
+
+    pdfx = format_info.get("pdfx")
+    if pdfx or format_info.get("pdfa"):
+        # Un solo profilo per l'OutputIntent, condiviso da tutte le pagine
+        data, n, alternate, condition = color.intent_profile(pdfx)
+        pdf.add_output_intent(
+            OutputIntentSubType.PDFX if pdfx else OutputIntentSubType.PDFA,
+            output_condition_identifier="Custom" if pdfx else "sRGB",
+            output_condition=condition if pdfx else "IEC 61966-2-1:1999",
+            registry_name="http://www.color.org",
+            dest_output_profile=PDFICCProfile(contents=data, n=n, alternate=alternate),
+            info=condition,
+        )
+
+    if pdfx:
+        # Stessa data in Info e XMP: PDF/X richiede che le due copie coincidano
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        pdf.set_creation_date(now)
+        pdf.set_xmp_metadata(build_pdfx_xmp(pdf, pdfx, now))
+        pdf.print_info_entries = {
+            "/GTS_PDFXVersion": f"({pdfx})",
+            "/Trapped": "/False",
+            "/ModDate": PDFDate(now, with_tz=True).serialize(),
+        }
+
     return pdf
 
 
+def build_pdfx_xmp(pdf, pdfx, date):
+    """Pacchetto XMP (senza xpacket, lo aggiunge fpdf2) con identificazione PDF/X e copie dei campi Info"""
+    stamp = date.isoformat(timespec='seconds')
+    return f'''<x:xmpmeta xmlns:x="adobe:ns:meta/">
+  <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+    <rdf:Description rdf:about=""
+        xmlns:dc="http://purl.org/dc/elements/1.1/"
+        xmlns:xmp="http://ns.adobe.com/xap/1.0/"
+        xmlns:pdf="http://ns.adobe.com/pdf/1.3/"
+        xmlns:xmpMM="http://ns.adobe.com/xap/1.0/mm/"
+        xmlns:pdfxid="http://www.npes.org/pdfx/ns/id/">
+      <xmp:CreatorTool>{pdf.creator}</xmp:CreatorTool>
+      <xmp:CreateDate>{stamp}</xmp:CreateDate>
+      <xmp:ModifyDate>{stamp}</xmp:ModifyDate>
+      <xmp:MetadataDate>{stamp}</xmp:MetadataDate>
+      <pdf:Trapped>False</pdf:Trapped>
+      <pdfxid:GTS_PDFXVersion>{pdfx}</pdfxid:GTS_PDFXVersion>
+      <xmpMM:DocumentID>uuid:{uuid.uuid4()}</xmpMM:DocumentID>
+      <xmpMM:InstanceID>uuid:{uuid.uuid4()}</xmpMM:InstanceID>
+      <xmpMM:VersionID>1</xmpMM:VersionID>
+      <xmpMM:RenditionClass>default</xmpMM:RenditionClass>
+      <dc:format>application/pdf</dc:format>
+      <dc:title><rdf:Alt><rdf:li xml:lang="x-default">{pdf.title}</rdf:li></rdf:Alt></dc:title>
+      <dc:description><rdf:Alt><rdf:li xml:lang="x-default">{pdf.subject}</rdf:li></rdf:Alt></dc:description>
+    </rdf:Description>
+  </rdf:RDF>
+</x:xmpmeta>'''
+
+
+def page_print_boxes(positions, card_w, card_h, bleed=BLEED_MM):
+    """TrimBox (ingombro della griglia di carte) e BleedBox in punti PDF, origine in basso a sinistra"""
+    left = min(x for x, _ in positions)
+    top = min(y for _, y in positions)
+    right = max(x for x, _ in positions) + card_w
+    bottom = max(y for _, y in positions) + card_h
+
+    def box(l, t, r, b):
+        k = 72 / 25.4
+        return f"[{l * k:.2f} {(PAGE_H - b) * k:.2f} {r * k:.2f} {(PAGE_H - t) * k:.2f}]"
+
+    bleed_box = box(max(0, left - bleed), max(0, top - bleed),
+                    min(PAGE_W, right + bleed), min(PAGE_H, bottom + bleed))
+    return f"/TrimBox {box(left, top, right, bottom)} /BleedBox {bleed_box}"
+
+
+def define_output_classes():
+    """Sottoclassi della scrittura di fpdf2, definite quando fpdf2 viene caricato"""
+    global PrintPDFInfo, PrintOutputProducer
+
+    class PrintPDFInfo(PDFInfo):
+        """Info di fpdf2 con voci che non seguono la convenzione snake_case → CamelCase (GTS_PDFXVersion)"""
+
+        def _build_obj_dict(self, security_handler=None):
+            obj_dict = super()._build_obj_dict(security_handler)
+            obj_dict.update(self._print_entries)
+            return obj_dict
+
+
+    class PrintOutputProducer(OutputProducer):
+        """Scrittura di fpdf2 con TrimBox/BleedBox sulle pagine e voci PDF/X nel dizionario Info.
+        Gli stream immagine restano fuori dal buffer: li copia write_pdf al loro offset finale."""
+
+        def __init__(self, fpdf):
+            super().__init__(fpdf)
+            self.deferred_streams = {}
+
+        def _add_image(self, info):
+            img_obj = super()._add_image(info)
+            # /Length è già calcolata sui byte reali; nel buffer resta uno stream vuoto
+            self.deferred_streams[img_obj.id] = img_obj._contents
+            img_obj._contents = b""
+            return img_obj
+
+        def _add_pages(self, _slice=slice(0, None)):
+            page_objs = super()._add_pages(_slice)
+            boxes = getattr(self.fpdf, "print_page_boxes", None)
+            if boxes:
+                for page_obj in page_objs:
+                    # fpdf2 scrive solo /MediaBox: le altre box si accodano al suo valore
+                    width_pt, height_pt = page_obj.dimensions()
+                    page_obj.media_box = f"[0 0 {width_pt:.2f} {height_pt:.2f}] {boxes}"
+            return page_objs
+
+        def _add_info(self):
+            info_obj = super()._add_info()
+            entries = getattr(self.fpdf, "print_info_entries", None)
+            if entries:
+                info_obj.__class__ = PrintPDFInfo
+                info_obj._print_entries = entries
+            return info_obj
+
+
+def write_pdf(pdf, pdf_path, workers=1):
+    """Scrive il PDF in un file preallocato.
+    fpdf produce solo lo scheletro (dizionari, pagine, xref); gli offset finali sono calcolati prima di
+    scrivere, poi i worker scrivono scheletro e stream immagine direttamente nella loro posizione."""
+    load_libraries()
+    producers = []
+
+    def make_producer(doc):
+        producers.append(PrintOutputProducer(doc))
+        return producers[-1]
+
+    skeleton = memoryview(bytes(pdf.output(output_producer_class=make_producer)))
+    producer = producers[0]
+    raw = skeleton.obj
+
+    # Ogni stream va subito dopo "stream\n" del suo oggetto
+    inserts = sorted((raw.index(b"stream\n", producer.offsets[obj_id]) + 7, data)
+                     for obj_id, data in producer.deferred_streams.items())
+    starts = [pos for pos, _ in inserts]
+    shifts = list(itertools.accumulate((len(data) for _, data in inserts), initial=0))
+    total = shifts[-1]
+
+    def shifted(offset):
+        return offset + shifts[bisect.bisect_right(starts, offset)]
+
+    # xref e trailer rigenerati con gli offset spostati; il resto del trailer resta quello di fpdf
+    xref_start = raw.rindex(b"\nxref\n") + 1
+    trailer_start = raw.index(b"trailer\n", xref_start)
+    count = int(raw[xref_start:trailer_start].split(b"\n")[1].split()[1])
+    xref = ["xref", f"0 {count}", "0000000000 65535 f "]
+    xref += [f"{shifted(producer.offsets[obj_id]):010} 00000 n " for obj_id in range(1, count)]
+    trailer = re.sub(rb"startxref\n\d+", b"startxref\n%d" % (xref_start + total), raw[trailer_start:])
+    tail = ("\n".join(xref) + "\n").encode() + trailer
+    body_size = xref_start + total
+    size = body_size + len(tail)
+
+    # Ogni scrittura va al suo offset con os.pwrite, che rilascia il GIL: i worker copiano davvero in
+    # parallelo. Windows non ha pwrite: lì si scrive in sequenza con lseek + write
+    segments = []
+    src = 0
+    for (pos, _), shift in zip(inserts, shifts):
+        segments.append((src + shift, skeleton[src:pos]))
+        src = pos
+    segments.append((src + total, skeleton[src:xref_start]))
+    segments.append((body_size, tail))
+    segments += [(pos + shift, data) for (pos, data), shift in zip(inserts, shifts)]
+
+    with open(pdf_path, 'w+b') as f:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(f.fileno(), 0, size)
+        else:
+            f.truncate(size)
+        fd = f.fileno()
+
+        def write_segment(segment):
+            write_at(fd, segment[1], segment[0])
+
+        if hasattr(os, 'pwrite') and workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                list(ex.map(write_segment, segments))
+        else:
+            for segment in segments:
+                write_segment(segment)
+
+
+def write_at(fd, data, offset):
+    """Scrive tutti i byte di data a partire da offset, senza spostare la posizione condivisa del file"""
+    view = memoryview(data)
+    while view:
+        if hasattr(os, 'pwrite'):
+            written = os.pwrite(fd, view, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, view)
+        view = view[written:]
+        offset += written
+
+
+def check_pdf_compliance(pdf_path, pdf_format):
+    """Controllo offline della struttura PDF/X o PDF/A scritta da make_pdf; restituisce l'elenco dei problemi.
+    Non sostituisce un validatore completo: verifica le voci che questo programma deve produrre."""
+    format_info = PDF_FORMATS[pdf_format]
+    pdfx = format_info.get("pdfx")
+    problems = []
+    with open(pdf_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header = re.match(rb'%PDF-(\d\.\d)', data)
+        if not header or header.group(1).decode() < format_info["version"]:
+            problems.append(f"versione PDF inferiore a {format_info['version']}")
+        if data.find(b'/Encrypt') != -1:
+            problems.append("documento cifrato")
+        if len(re.findall(rb'/DestOutputProfile \d+ 0 R', data)) != 1:
+            problems.append("serve esattamente un profilo OutputIntent")
+        if data.find(b'/S /GTS_PDFX' if pdfx else b'/S /GTS_PDFA1') == -1:
+            problems.append("OutputIntent mancante")
+        if re.search(rb'/Subtype /Type1\b', data):
+            problems.append("font non incorporati")
+        if pdfx:
+            version = pdfx.encode()
+            if data.find(b'<pdfxid:GTS_PDFXVersion>' + version) == -1:
+                problems.append("GTS_PDFXVersion assente dall'XMP")
+            if data.find(b'/GTS_PDFXVersion (' + version + b')') == -1:
+                problems.append("GTS_PDFXVersion assente da Info")
+            if data.find(b'/Trapped /False') == -1:
+                problems.append("Trapped assente da Info")
+            pages = len(re.findall(rb'/Type /Page\b', data))
+            if len(re.findall(rb'/TrimBox \[', data)) != pages or len(re.findall(rb'/BleedBox \[', data)) != pages:
+                problems.append("TrimBox/BleedBox mancanti su alcune pagine")
+        elif data.find(b'<pdfaid:part>1</pdfaid:part>') == -1:
+            problems.append("identificazione PDF/A assente dall'XMP")
+        if not format_info["transparency"]:
+            if data.find(b'/SMask') != -1 or data.find(b'/S /Transparency') != -1:
+                problems.append("trasparenze presenti")
+        if format_info["color"] == "cmyk":
+            if data.find(b'/ColorSpace /DeviceRGB') != -1 or data.find(b'/ICCBased') != -1:
+                problems.append("immagini non CMYK")
+    return problems
+
+
 def make_pdf(image_folder, output_pdf, logo_path, progress_callback,
-             dpi, card_w, card_h, gap, show_crop_marks, workers, include_back, pdf_format):
-    images = list_image_files(image_folder)
+             dpi, card_w, card_h, gap, show_crop_marks, workers, include_back, pdf_format,
+             back_calibration=None, card_backs=False, back_manifest=None, cache_dir=None,
+             scan_options=None, preflight=False, report=None, draft=False, cmyk_profile=None,
+             alpha_background=ALPHA_BACKGROUND_DEFAULT, compression_level=COMPRESSION_LEVEL_DEFAULT,
+             volume_sheets=0, volume_max_mb=0, executor=None, auto_workers=False, workers_hint=None,
+             prefetch_mb=PREFETCH_MB_DEFAULT, temp_root=None, failed_policy=FAILED_CARD_POLICY_DEFAULT,
+             stamp_numbers=False):
+    load_libraries()
+    if draft:
+        dpi = DRAFT_DPI
+        compression_level = DRAFT_COMPRESSION_LEVEL
+
+    images = list_image_files(image_folder, **(scan_options or {}))
+    card_back_sources = [None] * len(images)
+    if card_backs:
+        manifest = load_back_manifest(back_manifest) if back_manifest else None
+        images, backs_by_stem = split_back_images(images, manifest)
+        card_back_sources = find_card_backs(images, backs_by_stem, manifest)
     if not images:
         return False, "Nessuna immagine trovata!"
+    if failed_policy not in FAILED_CARD_POLICIES:
+        return False, f"Gestione errori sconosciuta: {failed_policy}"
 
     card_w_px = mm_to_px(card_w, dpi)
     card_h_px = mm_to_px(card_h, dpi)
@@ -137,106 +1560,783 @@ def make_pdf(image_folder, output_pdf, logo_path, progress_callback,
     slots_per_page = len(positions)
     total_images = len(images)
 
+    # La bozza resta in RGB: serve a controllare il layout, non il colore
+    try:
+        background = parse_hex_color(alpha_background)
+    except ValueError as e:
+        return False, str(e)
+    color = None if draft else ColorPipeline(PDF_FORMATS[pdf_format]["color"], cmyk_profile,
+                                             flatten=not PDF_FORMATS[pdf_format]["transparency"],
+                                             background=background)
+    color_key = color.cache_params() if color else None
+
+    # Con la gestione colore attiva anche il logo passa dai worker, come un retro qualsiasi
+    logo_source = None
+    if include_back and logo_path and color and color.mode != "rgb":
+        logo_source = os.path.realpath(logo_path)
+    unique_backs = sorted({b for b in card_back_sources if b} | ({logo_source} if logo_source else set()))
+
+    preflight_errors = {}
+    if preflight:
+        to_check = images + unique_backs + ([logo_path] if include_back and logo_path and not logo_source else [])
+        progress_callback(0, f"Pre-flight di {len(to_check)} immagini...")
+        preflight_report = preflight_images(to_check, card_w, card_h, workers, executor=executor)
+        if report is not None:
+            report["preflight"] = preflight_report
+        if preflight_report["errors"]:
+            if failed_policy == "abort":
+                return False, "Pre-flight fallito:\n" + format_preflight_report(preflight_report)
+            # Con segnaposto o salto le immagini illeggibili diventano carte fallite come le altre
+            preflight_errors = {info["path"]: f"pre-flight: {info['error']}" for info in preflight_report["errors"]}
+
     temp_files = [None] * len(images)
-    progress_callback(0, f"Elaborazione {total_images} immagini...")
-
-    with ThreadPoolExecutor(max_workers=workers) as ex:
-        future_to_idx = {ex.submit(process_image_to_temp, images[i], card_w_px, card_h_px): i
-                         for i in range(len(images))}
-        completed = 0
-        for fut in as_completed(future_to_idx):
-            idx = future_to_idx[fut]
-            tmp = fut.result()
-            if tmp:
-                temp_files[idx] = tmp
-            completed += 1
-            progress_callback(min(50.0, completed / total_images * 50.0),
-                              f"Processate {completed}/{total_images} immagini")
-
-    temp_files = [f for f in temp_files if f is not None]
+    back_temp = {}
+    total_jobs = total_images + len(unique_backs)
+
+    # Sorgenti spariti o illeggibili dopo l'elenco diventano carte fallite, gestite come gli errori di decodifica
+    source_errors = dict(preflight_errors)
+    uses_logo = include_back and logo_path and not all(card_back_sources)
+    if uses_logo and not logo_source and logo_path not in source_errors:
+        # Senza gestione colore fpdf legge il logo da sé: va controllato qui, non durante la scrittura
+        try:
+            open(logo_path, 'rb').close()
+        except OSError as e:
+            source_errors[logo_path] = f"file non accessibile: {e.strerror or e}"
+
+    # Manifest delle pagine: se nessuna carta è cambiata il PDF esistente è già aggiornato
+    source_keys = {}
+    logo_key = None
+    manifest = None
+    if cache_dir:
+        for path in images + unique_backs:
+            try:
+                source_keys[path] = source_fingerprint(path, card_w_px, card_h_px, draft, color_key)
+            except OSError as e:
+                source_errors.setdefault(path, f"file non accessibile: {e.strerror or e}")
+        if include_back and logo_path and logo_path not in source_errors:
+            try:
+                logo_key = source_fingerprint(logo_path, color_key)
+            except OSError as e:
+                source_errors[logo_path] = f"file non accessibile: {e.strerror or e}"
+        layout = {"dpi": dpi, "card_w": card_w, "card_h": card_h, "gap": gap, "crop": show_crop_marks,
+                  "include_back": include_back, "pdf_format": pdf_format, "logo": logo_key,
+                  "compression_level": compression_level,
+                  "calibration": normalize_calibration(back_calibration),
+                  "volume_sheets": volume_sheets, "volume_max_mb": volume_max_mb, "stamp_numbers": stamp_numbers}
+        manifest = build_page_manifest(layout, [source_keys.get(p) for p in images],
+                                       [source_keys.get(b) if b else logo_key for b in card_back_sources],
+                                       slots_per_page, include_back)
+    previous_files = []
+    if cache_dir:
+        old_manifest = load_page_manifest(output_pdf)
+        previous_files = (old_manifest or {}).get("files", [])
+        changed_pages = count_changed_pages(old_manifest, manifest)
+        old_files = (old_manifest or {}).get("files", [output_pdf])
+        if changed_pages == 0 and all(os.path.exists(f) for f in old_files):
+            progress_callback(100, "Completato!")
+            return True, f"PDF già aggiornato: nessuna carta modificata ({len(manifest['pages'])} pagine PDF)"
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # Tutti i file intermedi stanno in una cartella del job, eliminata anche se qualcosa va storto
+    with JobWorkspace(temp_root) as workspace:
+        prepared = {}
+        image_errors = dict(source_errors)
+        decode_stats = DecodeStats()
+
+        def process(path):
+            if path in source_errors:
+                return None
+            data = reader.take(path) if reader else None
+            if cache_dir:
+                out = process_image_cached(path, card_w_px, card_h_px, cache_dir, source_keys[path], draft, color, data,
+                                           errors=image_errors, stats=decode_stats)
+            else:
+                out = process_image_to_temp(path, card_w_px, card_h_px, draft=draft, color=color, data=data,
+                                            temp_dir=workspace.path, errors=image_errors, stats=decode_stats)
+            # La bozza è JPEG e fpdf lo copia così com'è; il resto viene compresso qui, in parallelo.
+            # In cache anche lo stream compresso: le carte invariate non si decodificano né comprimono più
+            if out and not draft:
+                stream_path = prepared_stream_path(out, compression_level) if cache_dir else None
+                info = load_prepared_stream(stream_path) if stream_path and os.path.exists(stream_path) else None
+                if info is None:
+                    info = prepare_pdf_image(out, compression_level)
+                    if info is not None and stream_path:
+                        try:
+                            save_prepared_stream(stream_path, info)
+                        except OSError as e:
+                            print(f"⚠️ Stream non salvato in cache per {path}: {e}")
+                prepared[out] = info
+            return out
+
+        progress_callback(0, f"Elaborazione {total_jobs} immagini...")
+
+        # Ogni retro viene elaborato una sola volta, anche se condiviso da più fronti
+        jobs = [(temp_files, i, images[i]) for i in range(len(images))] + [(back_temp, b, b) for b in unique_backs]
+        tuner = None
+        if auto_workers:
+            tuner = ConcurrencyTuner(workers_hint or AUTO_WORKERS_START,
+                                     getattr(executor, "workers", AUTO_WORKERS_MAX))
+            workers = tuner.max_workers
+
+        # Si leggono in anticipo solo i sorgenti da elaborare davvero, non quelli già in cache
+        to_read = list(dict.fromkeys(
+            path for _, _, path in jobs
+            if path not in source_errors
+            and not (cache_dir and os.path.exists(cached_image_path(cache_dir, source_keys[path], draft, color)))))
+        reader = ReadAhead(to_read, prefetch_mb * 1024 * 1024) if prefetch_mb > 0 and to_read else None
+
+        # Con executor (WorkerPool della GUI o del servizio HTTP) il pool resta aperto tra un job e l'altro
+        pool = contextlib.nullcontext(executor) if executor else ThreadPoolExecutor(max_workers=workers)
+        with pool as ex, (reader or contextlib.nullcontext()):
+            # In automatico i lavori in volo sono limitati dal tuner, altrimenti si accodano tutti subito
+            pending = {}
+            next_job = 0
+            completed = 0
+            while next_job < len(jobs) or pending:
+                limit = tuner.current if tuner else len(jobs)
+                while next_job < len(jobs) and len(pending) < limit:
+                    target, slot, path = jobs[next_job]
+                    pending[ex.submit(process, path)] = (target, slot)
+                    next_job += 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    target, slot = pending.pop(fut)
+                    tmp = fut.result()
+                    if tmp:
+                        target[slot] = tmp
+                    completed += 1
+                    progress_callback(min(50.0, completed / total_jobs * 50.0),
+                                      f"Processate {completed}/{total_jobs} immagini")
+                if tuner:
+                    tuner.record(len(done))
+        if tuner:
+            workers = tuner.best_workers
+        if report is not None:
+            report["workers"] = {"auto": bool(tuner), "best": workers,
+                                 "batches": tuner.history if tuner else []}
+            report["decode"] = decode_stats.summary()
+            report["decode_recovered"] = decode_stats.recovered()
+            if reader:
+                report["prefetch"] = {key: round(value, 3) for key, value in reader.stats.items()}
+
+        # Elenco strutturato delle immagini non elaborate (numero = posizione della carta nella cartella, 0 = logo)
+        failed_backs = {b for b in unique_backs if b not in back_temp and b != logo_source}
+        failures = [{"card": i + 1, "side": "fronte", "path": images[i],
+                     "error": image_errors.get(images[i], "elaborazione fallita")}
+                    for i in range(len(images)) if temp_files[i] is None]
+        failures += [{"card": i + 1, "side": "retro", "path": card_back_sources[i],
+                      "error": image_errors.get(card_back_sources[i], "elaborazione fallita")}
+                     for i in range(len(images)) if card_back_sources[i] in failed_backs]
+        # Il logo comune convertito male non va sostituito dall'originale (RGB non convertito in PDF/X-1a)
+        logo_failed = bool(uses_logo and (
+            (logo_source and logo_source not in back_temp) or logo_path in source_errors))
+        if logo_failed:
+            failures.append({"card": 0, "side": "logo", "path": logo_path,
+                             "error": image_errors.get(logo_source) or source_errors.get(logo_path)
+                             or "elaborazione fallita"})
+        failures.sort(key=lambda f: (f["card"], f["side"]))
+        if report is not None:
+            report["failed"] = failures
+
+        def failure_label(f):
+            return "logo retro" if f["side"] == "logo" else f"carta {f['card']} {f['side']}"
+
+        if failures and failed_policy == "abort":
+            details = "\n".join(f"- {failure_label(f)} {os.path.basename(f['path'])}: {f['error']}"
+                                 for f in failures[:10])
+            return False, f"{len(failures)} immagini non elaborate, generazione interrotta:\n{details}"
+        if not any(temp_files):
+            return False, "Nessuna immagine elaborata correttamente!"
+
+        # Con i segnaposto ogni carta resta nel suo slot; saltando, le successive scorrono
+        if failed_policy == "skip":
+            kept = [i for i in range(len(temp_files)) if temp_files[i] is not None]
+        else:
+            kept = list(range(len(temp_files)))
+        logo_file = None if logo_failed else back_temp.get(logo_source, logo_path)
+        back_files = [back_temp.get(card_back_sources[i], logo_file) for i in kept]
+        back_failed = [card_back_sources[i] in failed_backs or (not card_back_sources[i] and logo_failed)
+                       for i in kept]
+        # Il numero è la posizione nella cartella ordinata: resta lo stesso anche se una carta viene saltata
+        card_numbers = [i + 1 for i in kept]
+        temp_files = [temp_files[i] for i in kept]
+
+        chunks = [temp_files[i:i + slots_per_page] for i in range(0, len(temp_files), slots_per_page)]
+        back_chunks = [back_files[i:i + slots_per_page] for i in range(0, len(back_files), slots_per_page)]
+        back_failed_chunks = [back_failed[i:i + slots_per_page] for i in range(0, len(back_failed), slots_per_page)]
+        number_chunks = [card_numbers[i:i + slots_per_page] for i in range(0, len(card_numbers), slots_per_page)]
+        # Il numero sta nel gap sotto la carta, con mezzo millimetro di distacco sopra e sotto
+        number_height = min(SLUG_DIGIT_MM, gap - 1.0)
+        stamp_numbers = stamp_numbers and number_height >= SLUG_MIN_DIGIT_MM
+
+        def image_size(path):
+            info = prepared.get(path)
+            if info:
+                return len(info["data"]) + len(info.get("smask", b""))
+            return os.path.getsize(path)
+
+        # Un foglio è la coppia retro+fronte (o il solo fronte): i volumi lo tengono sempre intero
+        sheets = [chunk + (back_chunk if include_back else []) for chunk, back_chunk in zip(chunks, back_chunks)]
+        volumes = split_volumes(sheets, image_size, volume_sheets, volume_max_mb * 1024 * 1024)
+        if len(volumes) == 1:
+            volume_paths = [output_pdf]
+        else:
+            volume_paths = [volume_output_path(output_pdf, n + 1) for n in range(len(volumes))]
+
+        if include_back:
+            # La correzione di calibrazione è calcolata una sola volta per layout
+            back_positions, back_w, back_h = compute_back_positions(positions, card_w, card_h, back_calibration)
+            back_rotation = normalize_calibration(back_calibration)["rotation"]
+
+        format_info = PDF_FORMATS[pdf_format]
+        total_steps = len(chunks) * (2 if include_back else 1)
+        progress_lock = threading.Lock()
+        pages_done = [0]
+
+        def page_done():
+            with progress_lock:
+                pages_done[0] += 1
+                progress_callback(50 + (pages_done[0] / total_steps) * 45,
+                                  f"Creazione PDF: pagina {pages_done[0]}/{total_steps}")
+
+        def build_volume(sheet_indices, path):
+            # La bozza non dichiara conformità: niente profili né metadati di stampa
+            pdf = FPDF(unit='mm', format='A4', enforce_compliance=format_info.get("pdfa") if color else None)
+            pdf = apply_pdf_format(pdf, pdf_format, color)
+            if color and format_info.get("pdfx"):
+                pdf.print_page_boxes = page_print_boxes(positions, card_w, card_h)
+            pdf.set_auto_page_break(False)
+            pdf.set_compression(True)
+            for name, info in prepared.items():
+                if info:
+                    # Copia per volume: fpdf annota indici e utilizzi nel dizionario, i byte restano condivisi
+                    register_pdf_image(pdf, name, RasterImageInfo(info))
+
+            for sheet in sheet_indices:
+                chunk = chunks[sheet]
+                if include_back:
+                    # RETRO
+                    back_chunk = back_chunks[sheet]
+                    pdf.add_page()
+                    with pdf.rotation(back_rotation, x=PAGE_W / 2, y=PAGE_H / 2):
+                        for slot_idx, (x_b, y_b) in enumerate(back_positions):
+                            if slot_idx >= len(chunk):
+                                break
+                            if back_failed_chunks[sheet][slot_idx]:
+                                draw_placeholder(pdf, x_b, y_b, back_w, back_h)
+                            elif back_chunk[slot_idx]:
+                                pdf.image(back_chunk[slot_idx], x=x_b, y=y_b, w=back_w, h=back_h)
+                    page_done()
+
+                # FRONTE
+                pdf.add_page()
+                for slot_idx, slot_pos in enumerate(positions):
+                    if slot_idx >= len(chunk):
+                        break
+                    img_file = chunk[slot_idx]
+                    x_f, y_f = slot_pos
+                    if img_file:
+                        pdf.image(img_file, x=x_f, y=y_f, w=card_w, h=card_h)
+                    else:
+                        draw_placeholder(pdf, x_f, y_f, card_w, card_h)
+                    if show_crop_marks:
+                        draw_crop_marks(pdf, x_f, y_f, card_w, card_h)
+                    if stamp_numbers:
+                        draw_index_number(pdf, number_chunks[sheet][slot_idx], x_f + card_w / 2, y_f + card_h + 0.5,
+                                          number_height)
+                page_done()
+
+            # Il PDF precedente resta valido finché quello nuovo non è completo
+            write_pdf(pdf, path + ".tmp", max(1, workers // len(volumes)))
+            if color and (format_info.get("pdfx") or format_info.get("pdfa")):
+                return check_pdf_compliance(path + ".tmp", pdf_format)
+            return []
+
+        compliance_problems = []
+        try:
+            # Ogni volume ha il proprio documento fpdf e il proprio writer
+            # Un thread per volume, ma non più dei worker scelti: ogni writer usa a sua volta i worker restanti
+            with ThreadPoolExecutor(max_workers=max(1, min(len(volumes), workers))) as ex:
+                volume_problems = list(ex.map(build_volume, volumes, volume_paths))
+
+            progress_callback(95, f"Salvataggio {pdf_format}...")
+            for path, problems in zip(volume_paths, volume_problems):
+                os.replace(path + ".tmp", path)
+                if len(volume_paths) > 1:
+                    problems = [f"{os.path.basename(path)}: {p}" for p in problems]
+                compliance_problems += problems
+            # Uscite della generazione precedente non riscritte (volumi in più, file unico diventato volumi)
+            for path in previous_files:
+                if path not in volume_paths:
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+        finally:
+            # Se un volume fallisce, quelli già scritti non devono restare accanto al PDF come .tmp
+            for path in volume_paths:
+                with contextlib.suppress(OSError):
+                    os.remove(path + ".tmp")
+        if report is not None and color and (format_info.get("pdfx") or format_info.get("pdfa")):
+            report["compliance"] = compliance_problems
+
+        if include_back:
+            mode_msg = "duplex, retro per carta" if any(card_back_sources) else "duplex"
+        else:
+            mode_msg = "solo fronte"
+
+        format_name = PDF_FORMATS[pdf_format]["name"]
+        if draft:
+            mode_msg += f", bozza {DRAFT_DPI} DPI"
+        message = (f"PDF creato ({mode_msg}, {format_name}): {len(chunks)} pagine, "
+                   f"{sum(1 for f in temp_files if f)} carte")
+        if len(volumes) > 1:
+            message += f", {len(volumes)} volumi"
+
+        if cache_dir:
+            # Il manifest si salva solo se tutte le carte sono andate a buon fine,
+            # altrimenti la prossima esecuzione riprova quelle fallite
+            if not failures and len(back_temp) == len(unique_backs):
+                manifest["files"] = volume_paths
+                with open(page_manifest_path(output_pdf), 'w') as f:
+                    json.dump(manifest, f)
+            prune_cache(cache_dir)
+            message += f", {len(to_read)}/{total_jobs} immagini rielaborate"
+
+        if failures:
+            action = "segnaposto al loro posto" if failed_policy == "placeholder" else "saltate"
+            message += f"\n⚠️ {len(failures)} immagini non elaborate ({action}): " + ", ".join(
+                failure_label(f) for f in failures[:10])
+        if compliance_problems:
+            message += f"\n⚠️ Verifica {format_name}: " + "; ".join(compliance_problems)
+
+        if report is not None:
+            # Con la cache attiva le carte elaborate vanno in cache_dir, non nella cartella del job
+            report["workspace"] = {"path": workspace.path, "bytes": workspace.usage(), "cache_dir": cache_dir}
+        progress_callback(100, "Completato!")
+        return True, message
+
+
+# ---------- pool di worker ----------
+def warm_worker(barrier):
+    """Carica le librerie e inizializza libvips nel thread; la barriera tiene occupato ogni thread
+    finché tutti sono partiti, così il pool li crea davvero tutti"""
+    load_libraries()
+    pyvips.Image.black(8, 8).avg()
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+
+
+class WorkerPool:
+    """Pool di thread di lunga durata, riusato tra una generazione e l'altra e ridimensionabile.
+    Espone submit/map come ThreadPoolExecutor, così make_pdf lo usa come executor."""
+
+    def __init__(self, workers):
+        self.lock = threading.Lock()
+        self.workers = max(1, int(workers))
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="card-worker")
+
+    def submit(self, fn, *args, **kwargs):
+        with self.lock:
+            return self.executor.submit(fn, *args, **kwargs)
+
+    def map(self, fn, *iterables):
+        with self.lock:
+            executor = self.executor
+        return executor.map(fn, *iterables)
+
+    def warm(self):
+        with self.lock:
+            barrier = threading.Barrier(self.workers, timeout=10)
+            for _ in range(self.workers):
+                self.executor.submit(warm_worker, barrier)
+
+    def resize(self, workers):
+        workers = max(1, int(workers))
+        with self.lock:
+            if workers == self.workers:
+                return
+            old = self.executor
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="card-worker")
+            self.workers = workers
+        # I lavori già assegnati al vecchio pool terminano normalmente, poi i suoi thread si chiudono
+        old.shutdown(wait=False)
+        self.warm()
+
+    def shutdown(self):
+        with self.lock:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ConcurrencyTuner:
+    """Regola quanti lavori tenere in volo misurando carte/s a ogni lotto (salita a gradini).
+    Il tempo CPU del processo diviso per tempo reale e core dice quanto si lavora davvero:
+    CPU bassa = si aspetta il disco o la rete, quindi più thread aiutano; CPU satura = inutile crescere."""
+
+    def __init__(self, start, max_workers):
+        self.max_workers = max(1, int(max_workers))
+        self.current = min(max(1, int(start)), self.max_workers)
+        self.direction = 1
+        self.reversals = 0
+        self.settled = False
+        self.last_rate = None
+        self.best_rate, self.best_workers = 0.0, self.current
+        self.history = []
+        self.start_batch()
+
+    def start_batch(self):
+        self.batch_done = 0
+        self.batch_wall = time.perf_counter()
+        self.batch_cpu = time.process_time()
+
+    def record(self, done):
+        self.batch_done += done
+        if self.settled or self.batch_done < max(4, 2 * self.current):
+            return
+        wall = time.perf_counter() - self.batch_wall
+        cpu = (time.process_time() - self.batch_cpu) / max(wall, 1e-6) / (os.cpu_count() or 1)
+        rate = self.batch_done / max(wall, 1e-6)
+        self.history.append({"workers": self.current, "cards_s": round(rate, 2),
+                             "cpu": round(min(cpu, 1.0), 2), "io_wait": round(max(0.0, 1.0 - cpu), 2)})
+        if rate > self.best_rate:
+            self.best_rate, self.best_workers = rate, self.current
+        # Senza un guadagno di almeno il 5% (o con la CPU già satura) si torna indietro
+        if (self.last_rate is not None and rate < self.last_rate * 1.05) or (self.direction > 0 and cpu > 0.9):
+            self.direction = -self.direction
+            self.reversals += 1
+        self.last_rate = rate
+        step = max(1, self.current // 2) if self.direction > 0 else max(1, self.current // 4)
+        target = min(max(1, self.current + self.direction * step), self.max_workers)
+        if self.reversals >= 2 or target == self.current:
+            self.settled = True
+            target = self.best_workers
+        self.current = target
+        self.start_batch()
+
+
+# ---------- modalità watch ----------
+class FolderWatcher:
+    """Controlla la cartella a intervalli regolari e chiama on_change quando le immagini smettono di cambiare"""
+
+    def __init__(self, folder, on_change, interval=2.0, debounce=5.0, scan_options=None):
+        self.folder = folder
+        self.on_change = on_change
+        self.scan_options = scan_options or {}
+        self.interval = interval
+        self.debounce = debounce
+        self._stop = threading.Event()
+        self._thread = None
+
+    def snapshot(self):
+        state = {}
+        for path in list_image_files(self.folder, **self.scan_options):
+            try:
+                st = os.stat(path)
+                state[path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                pass
+        return state
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _run(self):
+        processed = None  # prima scansione: genera subito il PDF aggiornato
+        last_seen = None
+        last_change = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                current = self.snapshot()
+            except OSError:
+                current = last_seen
+            if current != last_seen:
+                # File ancora in copia: si aspetta che la cartella resti stabile
+                last_seen = current
+                last_change = time.monotonic()
+            elif current != processed and time.monotonic() - last_change >= self.debounce:
+                processed = current
+                try:
+                    self.on_change()
+                except Exception as e:
+                    print(f"⚠️ Errore watch {self.folder}: {e}")
+            self._stop.wait(self.interval)
+
+
+# ---------- servizio di rendering ----------
+# Parametri di make_pdf accettati da un job, con i valori predefiniti della GUI
+JOB_DEFAULTS = {
+    "dpi": 1200, "card_w": float(CARD_WIDTH_MM), "card_h": float(CARD_HEIGHT_MM), "gap": float(GAP_MM),
+    "show_crop_marks": True, "include_back": False, "pdf_format": "PDF/X-4 (Stampa con trasparenze)",
+    "logo_path": "", "card_backs": False, "preflight": True, "draft": False, "cmyk_profile": "",
+    "alpha_background": ALPHA_BACKGROUND_DEFAULT, "compression_level": COMPRESSION_LEVEL_DEFAULT,
+    "volume_sheets": 0, "volume_max_mb": 0, "recursive": False, "failed_policy": FAILED_CARD_POLICY_DEFAULT,
+    "order": "path", "decklist": "", "stamp_numbers": False,
+}
 
-    pdf = FPDF(unit='mm', format='A4')
-    pdf = apply_pdf_format(pdf, pdf_format)
-    pdf.set_auto_page_break(False)
-    pdf.set_compression(True)
-
-    chunks = [temp_files[i:i + slots_per_page] for i in range(0, len(temp_files), slots_per_page)]
-
-    if include_back:
-        processed_count = 0
-        total_steps = len(chunks) * 2
-
-        for chunk in chunks:
-            # RETRO
-            pdf.add_page()
-            for slot_idx, slot_pos in enumerate(positions):
-                if slot_idx >= len(chunk):
-                    break
-                x_f, y_f = slot_pos
-                x_b = PAGE_W - x_f - card_w
-                y_b = y_f
-                pdf.image(logo_path, x=x_b, y=y_b, w=card_w, h=card_h)
-
-            processed_count += 1
-            progress_callback(50 + (processed_count / total_steps) * 25,
-                              f"Creazione PDF: pagina {processed_count}/{total_steps}")
-
-            # FRONTE
-            pdf.add_page()
-            for slot_idx, slot_pos in enumerate(positions):
-                if slot_idx >= len(chunk):
-                    break
-                img_file = chunk[slot_idx]
-                x_f, y_f = slot_pos
-                pdf.image(img_file, x=x_f, y=y_f, w=card_w, h=card_h)
-                if show_crop_marks:
-                    draw_crop_marks(pdf, x_f, y_f, card_w, card_h)
-
-            processed_count += 1
-            progress_callback(75 + (processed_count / total_steps) * 25,
-                              f"Creazione PDF: pagina {processed_count}/{total_steps}")
-
-        mode_msg = "duplex"
-    else:
-        processed_count = 0
-        total_steps = len(chunks)
-
-        for chunk in chunks:
-            pdf.add_page()
-            for slot_idx, slot_pos in enumerate(positions):
-                if slot_idx >= len(chunk):
-                    break
-                img_file = chunk[slot_idx]
-                x_f, y_f = slot_pos
-                pdf.image(img_file, x=x_f, y=y_f, w=card_w, h=card_h)
-                if show_crop_marks:
-                    draw_crop_marks(pdf, x_f, y_f, card_w, card_h)
-
-            processed_count += 1
-            progress_callback(50 + (processed_count / total_steps) * 45,
-                              f"Creazione PDF: pagina {processed_count}/{total_steps}")
-
-        mode_msg = "solo fronte"
-
-    progress_callback(95, f"Salvataggio {pdf_format}...")
-    pdf.output(output_pdf)
 
-    for f in temp_files:
+def coerce_job_param(key, value):
+    """Converte un parametro (testo della query string o valore JSON) nel tipo del valore predefinito;
+    ValueError se il valore non è convertibile"""
+    default = JOB_DEFAULTS.get(key, "")  # image_folder e name sono testo
+    if isinstance(default, bool):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, (str, int)):
+            return str(value).lower() in ("1", "true", "si", "sì", "yes", "on")
+    elif isinstance(default, str):
+        if isinstance(value, str):
+            return value
+    elif isinstance(value, (str, int, float)) and not isinstance(value, bool):
         try:
-            os.remove(f)
-        except:
+            return type(default)(value)
+        except ValueError:
             pass
-
-    progress_callback(100, "Completato!")
-    format_name = PDF_FORMATS[pdf_format]["name"]
-    return True, f"PDF creato ({mode_msg}, {format_name}): {len(chunks)} pagine, {len(temp_files)} carte"
+    raise ValueError(f"{key}: valore non valido ({value!r})")
+
+
+def upload_path(images_dir, relative):
+    """Percorso di un file dello zip caricato; rifiuta tutto ciò che esce dalla cartella del job ("..", link)"""
+    root = os.path.realpath(images_dir)
+    path = os.path.realpath(os.path.join(root, relative))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"percorso fuori dall'archivio: {relative}")
+    return path
+
+
+class RenderService:
+    """Coda di job make_pdf: i job in esecuzione insieme condividono il pool di worker e la cache delle carte"""
+
+    def __init__(self, work_dir=SERVICE_DIR, workers=None, concurrent_jobs=1, cache_dir=CACHE_DIR):
+        self.work_dir = os.path.abspath(work_dir)
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.workers = workers or os.cpu_count() or 4
+        self.pool = WorkerPool(self.workers)
+        self.queue = queue.Queue()
+        self.jobs = {}
+        self.lock = threading.Lock()
+        os.makedirs(self.work_dir, exist_ok=True)
+        for _ in range(max(1, concurrent_jobs)):
+            threading.Thread(target=self.run_jobs, daemon=True).start()
+
+    def submit(self, params, archive=None):
+        """Accoda un job; archive (zip) sostituisce image_folder con le immagini caricate.
+        I valori (testo della query string o JSON) sono convertiti nel tipo dei predefiniti"""
+        if not isinstance(params, dict):
+            raise ValueError("i parametri devono essere un oggetto JSON")
+        unknown = set(params) - set(JOB_DEFAULTS) - {"image_folder", "name"}
+        if unknown:
+            raise ValueError(f"Parametri sconosciuti: {', '.join(sorted(unknown))}")
+        params = {key: coerce_job_param(key, value) for key, value in params.items()}
+        if params.get("pdf_format", JOB_DEFAULTS["pdf_format"]) not in PDF_FORMATS:
+            raise ValueError(f"Formato PDF sconosciuto: {params['pdf_format']}")
+        if params.get("order", "path") not in ORDER_MODES:
+            raise ValueError(f"order deve essere uno tra: {', '.join(ORDER_MODES)}")
+        if params.get("failed_policy", FAILED_CARD_POLICY_DEFAULT) not in FAILED_CARD_POLICIES:
+            raise ValueError(f"failed_policy deve essere uno tra: {', '.join(FAILED_CARD_POLICIES)}")
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.work_dir, job_id)
+        os.makedirs(job_dir)
+        try:
+            if archive is not None:
+                images_dir = os.path.join(job_dir, "immagini")
+                with zipfile.ZipFile(archive) as zf:
+                    # extractall scarta percorsi assoluti e componenti ".."
+                    zf.extractall(images_dir)
+                params["image_folder"] = images_dir
+                if params.get("logo_path") and not os.path.isabs(params["logo_path"]):
+                    # Il logo caricato nello zip non deve finire tra le carte
+                    logo = os.path.join(job_dir, os.path.basename(params["logo_path"]))
+                    os.replace(upload_path(images_dir, params["logo_path"]), logo)
+                    params["logo_path"] = logo
+                if params.get("decklist") and not os.path.isabs(params["decklist"]):
+                    params["decklist"] = upload_path(images_dir, params["decklist"])
+            if not params.get("image_folder"):
+                raise ValueError("image_folder mancante")
+        except (OSError, zipfile.BadZipFile, ValueError) as e:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise ValueError(f"Job non valido: {e}")
+        name = os.path.basename(params.pop("name", "") or "carte")
+        job = {"id": job_id, "status": "queued", "progress": 0.0, "message": "In coda",
+               "created": time.time(), "files": [], "params": params,
+               "output": os.path.join(job_dir, os.path.splitext(name)[0] + ".pdf")}
+        with self.lock:
+            self.jobs[job_id] = job
+        self.queue.put(job_id)
+        return self.status(job_id)
+
+    def status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            info = {k: job[k] for k in ("id", "status", "progress", "message", "created")}
+            info["files"] = [os.path.basename(f) for f in job["files"]]
+            if job.get("report", {}).get("failed"):
+                info["failed"] = job["report"]["failed"]
+            if job["status"] == "queued":
+                queued = [j for j in self.jobs.values() if j["status"] == "queued"]
+                info["queue_position"] = sorted(queued, key=lambda j: j["created"]).index(job) + 1
+            return info
+
+    def list_jobs(self):
+        with self.lock:
+            ids = sorted(self.jobs, key=lambda i: self.jobs[i]["created"])
+        return [self.status(i) for i in ids]
+
+    def result_path(self, job_id, volume=1):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] != "done" or not 1 <= volume <= len(job["files"]):
+                return None
+            return job["files"][volume - 1]
+
+    def remove(self, job_id):
+        """Annulla un job in coda o elimina i file di uno concluso; quelli in esecuzione non si toccano"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] == "running":
+                return False
+            if job["status"] == "queued":
+                job["status"] = "cancelled"
+                job["message"] = "Annullato"
+                return True
+            del self.jobs[job_id]
+        shutil.rmtree(os.path.dirname(job["output"]), ignore_errors=True)
+        return True
+
+    def run_jobs(self):
+        while True:
+            job_id = self.queue.get()
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job is None or job["status"] != "queued":
+                    continue
+                job["status"] = "running"
+            self.run_job(job)
+
+    def run_job(self, job):
+        def progress(value, message):
+            with self.lock:
+                job["progress"] = round(value, 1)
+                job["message"] = message
+
+        params = {**JOB_DEFAULTS, **job["params"]}
+        scan_options = {"recursive": params.pop("recursive"), "use_index": True,
+                        "order": params.pop("order"), "decklist": params.pop("decklist") or None}
+        report = {}
+        try:
+            success, message = make_pdf(
+                output_pdf=job["output"], progress_callback=progress, workers=self.workers,
+                cache_dir=self.cache_dir, scan_options=scan_options,
+                report=report, executor=self.pool,
+                **{**params, "logo_path": params["logo_path"] or None,
+                   "cmyk_profile": params["cmyk_profile"] or None})
+        except Exception as e:
+            success, message = False, f"Errore durante la generazione: {e}"
+        if success:
+            manifest = load_page_manifest(job["output"]) or {}
+            files = manifest.get("files") or [job["output"]]
+            if not os.path.exists(files[0]):
+                # Senza manifest (carte fallite) i volumi si ricavano dai file presenti
+                files = sorted(str(p) for p in Path(job["output"]).parent.glob(Path(job["output"]).stem + "*.pdf"))
+        with self.lock:
+            job["status"] = "done" if success else "failed"
+            job["message"] = message
+            job["progress"] = 100.0 if success else job["progress"]
+            job["files"] = files if success else []
+            job["report"] = report
+
+    def make_handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def send_json(self, data, code=200):
+                body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def route(self):
+                url = urlparse(self.path)
+                return [p for p in url.path.split('/') if p], parse_qs(url.query)
+
+            def do_GET(self):
+                parts, query = self.route()
+                if parts == ["jobs"]:
+                    return self.send_json(service.list_jobs())
+                if len(parts) == 2 and parts[0] == "jobs":
+                    info = service.status(parts[1])
+                    return self.send_json(info) if info else self.send_json({"error": "job sconosciuto"}, 404)
+                if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+                    try:
+                        volume = int(query.get("volume", ["1"])[0])
+                    except ValueError:
+                        return self.send_json({"error": "volume deve essere un numero"}, 400)
+                    path = service.result_path(parts[1], volume)
+                    if not path:
+                        return self.send_json({"error": "risultato non disponibile"}, 404)
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/pdf")
+                    self.send_header("Content-Length", str(os.path.getsize(path)))
+                    self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+                    self.end_headers()
+                    with open(path, 'rb') as f:
+                        shutil.copyfileobj(f, self.wfile)
+                    return
+                self.send_json({"error": "percorso sconosciuto"}, 404)
+
+            def do_POST(self):
+                parts, query = self.route()
+                if parts != ["jobs"]:
+                    return self.send_json({"error": "percorso sconosciuto"}, 404)
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                try:
+                    if self.headers.get("Content-Type", "").startswith("application/zip"):
+                        # Mazzo caricato come zip; parametri nella query string
+                        info = service.submit({k: v[0] for k, v in query.items()}, archive=io.BytesIO(body))
+                    else:
+                        info = service.submit(json.loads(body or b"{}"))
+                except (ValueError, KeyError, TypeError) as e:
+                    return self.send_json({"error": str(e)}, 400)
+                self.send_json(info, 202)
+
+            def do_DELETE(self):
+                parts, _ = self.route()
+                if len(parts) == 2 and parts[0] == "jobs" and service.remove(parts[1]):
+                    return self.send_json({"id": parts[1], "removed": True})
+                self.send_json({"error": "job sconosciuto o in esecuzione"}, 409)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.pool.warm()
+        clean_stale_workspaces()
+        print(f"🖨️ Servizio di rendering su http://{host}:{server.server_port} "
+              f"({self.workers} worker, cartella job: {self.work_dir})")
+        return server
 
 
 # =============== INTERFACCIA GRAFICA ===============
 
 class CardPrinterApp:
-    def __init__(self, root):
+    def __init__(self, root, measure_startup=False):
         self.root = root
+        self.measure_startup = measure_startup
         self.root.title("🎴 Card Printer Pro - Vanguard Edition [TURBO]")
         self.root.geometry("700x920")
         self.root.resizable(False, False)
@@ -250,9 +2350,35 @@ class CardPrinterApp:
         self.card_height_var = tk.DoubleVar(value=86)
         self.gap_var = tk.DoubleVar(value=5)
         self.show_crop_var = tk.BooleanVar(value=True)
+        self.stamp_numbers_var = tk.BooleanVar(value=False)
         self.include_back_var = tk.BooleanVar(value=True)
+        self.card_backs_var = tk.BooleanVar(value=False)
+        self.use_cache_var = tk.BooleanVar(value=True)
+        self.preflight_var = tk.BooleanVar(value=True)
+        self.final_after_draft_var = tk.BooleanVar(value=True)
+        self.cmyk_profile_path = tk.StringVar()
+        self.alpha_background_var = tk.StringVar(value=ALPHA_BACKGROUND_DEFAULT)
+        self.compression_var = tk.IntVar(value=COMPRESSION_LEVEL_DEFAULT)
+        self.volume_sheets_var = tk.IntVar(value=0)
+        self.volume_max_mb_var = tk.IntVar(value=0)
+        self.prefetch_mb_var = tk.IntVar(value=PREFETCH_MB_DEFAULT)
+        self.temp_root_var = tk.StringVar()
+        self.failed_policy_var = tk.StringVar(value=FAILED_CARD_POLICY_DEFAULT)
+        self.recursive_var = tk.BooleanVar(value=False)
+        self.sniff_var = tk.BooleanVar(value=False)
+        self.order_var = tk.StringVar(value="path")
+        self.decklist_path = tk.StringVar()
+        self.include_globs_var = tk.StringVar()
+        self.exclude_globs_var = tk.StringVar()
+        self.back_manifest_path = tk.StringVar()
         self.workers_var = tk.IntVar(value=os.cpu_count() or 4)
+        self.auto_workers_var = tk.BooleanVar(value=False)
+        self.auto_workers_by_folder = {}  # cartella sorgente -> thread ottimali misurati
+        self.config_lock = threading.Lock()
         self.pdf_format_var = tk.StringVar(value="PDF/X-4 (Stampa con trasparenze)")
+        self.calibration_profiles = {}
+        self.calibration_profile_var = tk.StringVar(value="")
+        self.calibration_vars = {key: tk.DoubleVar(value=value) for key, value in CALIBRATION_DEFAULT.items()}
 
         # Trace per aggiornamento automatico
         self.card_width_var.trace_add('write', lambda *args: self.update_info())
@@ -260,8 +2386,66 @@ class CardPrinterApp:
         self.gap_var.trace_add('write', lambda *args: self.update_info())
         self.pdf_format_var.trace_add('write', lambda *args: self.update_info())
 
+        # Anteprima
+        self.preview_canvas = None
+        self.preview_after = None
+        self.preview_images = []
+        self.preview_page = 0
+        self.preview_thumbs = {}
+        self.preview_photos = {}
+        self.preview_loading = False
+        for var in (self.card_width_var, self.card_height_var, self.gap_var):
+            var.trace_add('write', lambda *args: self.schedule_preview())
+        self.image_folder.trace_add('write', lambda *args: self.refresh_preview_images())
+        self.order_var.trace_add('write', lambda *args: self.refresh_preview_images())
+        self.decklist_path.trace_add('write', lambda *args: self.refresh_preview_images())
+
+        self.generation_lock = threading.Lock()
+        self.watcher = None
+        self.startup_report = {}
+
         self.load_config()
+        # Pool di worker dell'app: creato una volta, riscaldato dopo il caricamento delle librerie
+        self.pool = WorkerPool(AUTO_WORKERS_MAX if self.auto_workers_var.get() else self.workers_var.get())
+        self.workers_var.trace_add('write', lambda *args: self.resize_pool())
+        self.auto_workers_var.trace_add('write', lambda *args: self.resize_pool())
         self.create_ui()
+        # La finestra è disegnata al primo ciclo idle; pyvips e fpdf2 si caricano dopo, in background
+        self.root.after_idle(self.on_window_ready)
+
+    def resize_pool(self):
+        # In automatico il pool ha tutti i thread possibili e make_pdf decide quanti usarne
+        auto = self.auto_workers_var.get()
+        if hasattr(self, 'workers_spin'):
+            self.workers_spin.config(state='disabled' if auto else 'normal')
+        try:
+            workers = AUTO_WORKERS_MAX if auto else self.workers_var.get()
+        except tk.TclError:
+            return  # spinbox vuoto durante la digitazione
+        if workers >= 1:
+            self.pool.resize(workers)
+
+    def on_window_ready(self):
+        self.startup_report["window_s"] = round(time.perf_counter() - STARTUP_T0, 3)
+        self.startup_report["window_epoch"] = time.time()
+        threading.Thread(target=self.warm_libraries, name="warmup", daemon=True).start()
+
+    def warm_libraries(self):
+        load_libraries()
+        self.pool.warm()
+        # Cartelle lasciate da generazioni interrotte (crash, chiusura forzata)
+        removed, freed = clean_stale_workspaces(self.temp_root_var.get() or None)
+        if removed:
+            print(f"🧹 Eliminate {removed} cartelle temporanee orfane ({freed / 1024 / 1024:.1f} MB)")
+        self.startup_report.update(LIBRARY_TIMINGS)
+        message = (f"Pronto (finestra in {self.startup_report['window_s']:.2f} s, "
+                   f"librerie in {LIBRARY_TIMINGS['libraries_s']:.2f} s)")
+        self.root.after(0, lambda: self.progress_label.config(text=message))
+        if self.measure_startup:
+            # Letto da measure_startup.py: l'istante assoluto copre anche l'avvio dell'exe prima di Python
+            print(json.dumps({"ready_epoch": time.time(), "frozen": getattr(sys, "frozen", False),
+                              **self.startup_report}), flush=True)
+            self.root.after(0, self.root.destroy)
 
     def create_ui(self):
         style = ttk.Style()
@@ -313,6 +2497,33 @@ class CardPrinterApp:
         tk.Entry(file_frame, textvariable=self.output_path, width=40, state='readonly').grid(row=2, column=1, padx=5)
         ttk.Button(file_frame, text="Sfoglia...", command=self.browse_output).grid(row=2, column=2)
 
+        scan_frame = tk.Frame(file_frame)
+        scan_frame.grid(row=3, column=0, columnspan=3, sticky='w', pady=(5, 0))
+        ttk.Checkbutton(scan_frame, text="Includi sottocartelle",
+                        variable=self.recursive_var).pack(side='left')
+        ttk.Checkbutton(scan_frame, text="Riconosci formato dal contenuto",
+                        variable=self.sniff_var).pack(side='left', padx=(15, 0))
+
+        tk.Label(file_frame, text="Includi (es. *.png; clan/*):").grid(row=4, column=0, sticky='w', pady=5)
+        tk.Entry(file_frame, textvariable=self.include_globs_var, width=40).grid(row=4, column=1, padx=5)
+        tk.Label(file_frame, text="Escludi:").grid(row=5, column=0, sticky='w', pady=5)
+        tk.Entry(file_frame, textvariable=self.exclude_globs_var, width=40).grid(row=5, column=1, padx=5)
+
+        tk.Label(file_frame, text="Ordine carte:").grid(row=6, column=0, sticky='w', pady=5)
+        order_frame = tk.Frame(file_frame)
+        order_frame.grid(row=6, column=1, columnspan=2, sticky='w', padx=5)
+        for order, label in ORDER_MODES.items():
+            ttk.Radiobutton(order_frame, text=label, variable=self.order_var,
+                            value=order).pack(side='left', padx=(0, 8))
+        tk.Label(file_frame, text="Lista del mazzo (.txt):").grid(row=7, column=0, sticky='w', pady=5)
+        tk.Entry(file_frame, textvariable=self.decklist_path, width=40,
+                 state='readonly').grid(row=7, column=1, padx=5)
+        decklist_buttons = tk.Frame(file_frame)
+        decklist_buttons.grid(row=7, column=2, sticky='w')
+        ttk.Button(decklist_buttons, text="Sfoglia...", command=self.browse_decklist).pack(side='left')
+        ttk.Button(decklist_buttons, text="✕", width=3,
+                   command=lambda: self.decklist_path.set("")).pack(side='left', padx=2)
+
         # === SEZIONE MODALITÀ STAMPA ===
         mode_frame = ttk.LabelFrame(main, text="🖨️ Modalità Stampa", padding=15)
         mode_frame.pack(fill='x', pady=(0, 15))
@@ -322,10 +2533,52 @@ class CardPrinterApp:
                                        command=self.toggle_back_mode)
         duplex_check.pack(anchor='w', pady=5)
 
+        ttk.Checkbutton(mode_frame, text=f"Retro per carta (file nome{BACK_SUFFIX}.png o manifest JSON)",
+                        variable=self.card_backs_var,
+                        command=self.update_mode_info).pack(anchor='w', pady=5)
+
+        manifest_frame = tk.Frame(mode_frame)
+        manifest_frame.pack(fill='x', pady=5)
+        tk.Label(manifest_frame, text="Manifest retro (opzionale):").pack(side='left')
+        tk.Entry(manifest_frame, textvariable=self.back_manifest_path, width=30,
+                 state='readonly').pack(side='left', padx=5)
+        ttk.Button(manifest_frame, text="Sfoglia...", command=self.browse_manifest).pack(side='left')
+        ttk.Button(manifest_frame, text="✕", width=3,
+                   command=lambda: self.back_manifest_path.set("")).pack(side='left', padx=2)
+
         self.mode_info = tk.Label(mode_frame, text="", fg='#27ae60', font=('Arial', 9))
         self.mode_info.pack(anchor='w', pady=5)
         self.update_mode_info()
 
+        # === SEZIONE CALIBRAZIONE ===
+        calib_frame = ttk.LabelFrame(main, text="🎯 Calibrazione Fronte-Retro", padding=15)
+        calib_frame.pack(fill='x', pady=(0, 15))
+
+        profile_frame = tk.Frame(calib_frame)
+        profile_frame.pack(fill='x', pady=5)
+        tk.Label(profile_frame, text="Profilo stampante:").pack(side='left')
+        self.calibration_combo = ttk.Combobox(profile_frame, textvariable=self.calibration_profile_var,
+                                              values=sorted(self.calibration_profiles), width=22)
+        self.calibration_combo.pack(side='left', padx=10)
+        self.calibration_combo.bind('<<ComboboxSelected>>', lambda e: self.load_calibration_profile())
+        ttk.Button(profile_frame, text="Salva profilo",
+                   command=self.save_calibration_profile).pack(side='left', padx=2)
+        ttk.Button(profile_frame, text="Elimina",
+                   command=self.delete_calibration_profile).pack(side='left', padx=2)
+
+        offsets_frame = tk.Frame(calib_frame)
+        offsets_frame.pack(fill='x', pady=5)
+        calibration_fields = [("X (mm):", "offset_x", -10, 10, 0.1), ("Y (mm):", "offset_y", -10, 10, 0.1),
+                              ("Rot. (°):", "rotation", -5, 5, 0.05),
+                              ("Scala X:", "scale_x", 0.9, 1.1, 0.001), ("Scala Y:", "scale_y", 0.9, 1.1, 0.001)]
+        for label, key, lo, hi, step in calibration_fields:
+            tk.Label(offsets_frame, text=label).pack(side='left', padx=(6, 2))
+            ttk.Spinbox(offsets_frame, from_=lo, to=hi, increment=step, textvariable=self.calibration_vars[key],
+                        width=6).pack(side='left')
+
+        ttk.Button(calib_frame, text="🖨️ Genera foglio di test",
+                   command=self.generate_calibration_sheet).pack(anchor='w', pady=5)
+
         # === SEZIONE FORMATO PDF ===
         pdf_format_frame = ttk.LabelFrame(main, text="📄 Formato PDF Professionale", padding=15)
         pdf_format_frame.pack(fill='x', pady=(0, 15))
@@ -343,6 +2596,15 @@ class CardPrinterApp:
         self.format_info_label.pack(anchor='w', pady=(10, 0))
         self.update_format_info()
 
+        icc_frame = tk.Frame(pdf_format_frame)
+        icc_frame.pack(fill='x', pady=(10, 0))
+        tk.Label(icc_frame, text="Profilo CMYK stampa (.icc):").pack(side='left')
+        tk.Entry(icc_frame, textvariable=self.cmyk_profile_path, width=28,
+                 state='readonly').pack(side='left', padx=5)
+        ttk.Button(icc_frame, text="Sfoglia...", command=self.browse_cmyk_profile).pack(side='left')
+        ttk.Button(icc_frame, text="✕", width=3,
+                   command=lambda: self.cmyk_profile_path.set("")).pack(side='left', padx=2)
+
         # === SEZIONE IMPOSTAZIONI ===
         settings_frame = ttk.LabelFrame(main, text="⚙️ Impostazioni Avanzate", padding=15)
         settings_frame.pack(fill='x', pady=(0, 15))
@@ -371,12 +2633,83 @@ class CardPrinterApp:
         workers_frame = tk.Frame(settings_frame)
         workers_frame.pack(fill='x', pady=5)
         tk.Label(workers_frame, text="Thread Elaborazione:").pack(side='left')
-        ttk.Spinbox(workers_frame, from_=1, to=32, textvariable=self.workers_var,
-                    width=6).pack(side='left', padx=10)
+        self.workers_spin = ttk.Spinbox(workers_frame, from_=1, to=32, textvariable=self.workers_var,
+                                        width=6, state='disabled' if self.auto_workers_var.get() else 'normal')
+        self.workers_spin.pack(side='left', padx=10)
+        tk.Checkbutton(workers_frame, text="Auto", variable=self.auto_workers_var).pack(side='left')
         tk.Label(workers_frame, text=f"(CPU: {os.cpu_count()} core)").pack(side='left')
+        tk.Label(workers_frame, text="Compressione:").pack(side='left', padx=(20, 0))
+        ttk.Spinbox(workers_frame, from_=0, to=9, textvariable=self.compression_var,
+                    width=4).pack(side='left', padx=10)
+        tk.Label(workers_frame, text="(1 veloce, 9 archivio)").pack(side='left')
+
+        background_frame = tk.Frame(settings_frame)
+        background_frame.pack(fill='x', pady=5)
+        tk.Label(background_frame, text="Sfondo trasparenze:").pack(side='left')
+        ttk.Entry(background_frame, textvariable=self.alpha_background_var, width=9).pack(side='left', padx=10)
+        tk.Label(background_frame, text="(#rrggbb, per i formati senza trasparenze)",
+                 fg='#7f8c8d').pack(side='left')
+        tk.Label(background_frame, text="Lettura anticipata MB:").pack(side='left', padx=(20, 0))
+        ttk.Spinbox(background_frame, from_=0, to=4096, increment=64, textvariable=self.prefetch_mb_var,
+                    width=6).pack(side='left', padx=5)
+        tk.Label(background_frame, text="(0 = off, utile su NAS)", fg='#7f8c8d').pack(side='left')
+
+        volumes_frame = tk.Frame(settings_frame)
+        volumes_frame.pack(fill='x', pady=5)
+        tk.Label(volumes_frame, text="Dividi in volumi: max fogli").pack(side='left')
+        ttk.Spinbox(volumes_frame, from_=0, to=9999, textvariable=self.volume_sheets_var,
+                    width=6).pack(side='left', padx=5)
+        tk.Label(volumes_frame, text="max MB").pack(side='left', padx=(10, 0))
+        ttk.Spinbox(volumes_frame, from_=0, to=100000, increment=100, textvariable=self.volume_max_mb_var,
+                    width=7).pack(side='left', padx=5)
+        tk.Label(volumes_frame, text="(0 = file unico)", fg='#7f8c8d').pack(side='left')
+
+        failed_frame = tk.Frame(settings_frame)
+        failed_frame.pack(fill='x', pady=5)
+        tk.Label(failed_frame, text="Immagini con errori:").pack(side='left')
+        for policy, label in FAILED_CARD_POLICIES.items():
+            ttk.Radiobutton(failed_frame, text=label, variable=self.failed_policy_var,
+                            value=policy).pack(side='left', padx=5)
+
+        temp_frame = tk.Frame(settings_frame)
+        temp_frame.pack(fill='x', pady=5)
+        tk.Label(temp_frame, text="Cartella temporanei:").pack(side='left')
+        ttk.Entry(temp_frame, textvariable=self.temp_root_var, width=30).pack(side='left', padx=10)
+        tk.Label(temp_frame, text="(vuoto = sistema; es. /dev/shm per lavorare in RAM;\n"
+                                  "con la rigenerazione incrementale le carte elaborate restano nella cache)",
+                 justify='left', fg='#7f8c8d').pack(side='left')
 
         ttk.Checkbutton(settings_frame, text="Mostra segni di taglio",
                         variable=self.show_crop_var).pack(anchor='w', pady=5)
+        ttk.Checkbutton(settings_frame, text="Numera le carte sotto il bordo (serve un gap di almeno 2 mm)",
+                        variable=self.stamp_numbers_var).pack(anchor='w', pady=5)
+        ttk.Checkbutton(settings_frame, text="Pre-flight: controlla tutte le immagini prima di elaborarle",
+                        variable=self.preflight_var).pack(anchor='w', pady=5)
+        ttk.Checkbutton(settings_frame, text=f"Dopo la bozza ({DRAFT_DPI} DPI) genera il PDF finale in background",
+                        variable=self.final_after_draft_var).pack(anchor='w', pady=5)
+        ttk.Checkbutton(settings_frame, text="Rigenerazione incrementale (rielabora solo le carte modificate)",
+                        variable=self.use_cache_var).pack(anchor='w', pady=5)
+
+        # === SEZIONE ANTEPRIMA ===
+        preview_frame = ttk.LabelFrame(main, text="👁️ Anteprima Foglio", padding=15)
+        preview_frame.pack(fill='x', pady=(0, 15))
+
+        preview_nav = tk.Frame(preview_frame)
+        preview_nav.pack(fill='x')
+        ttk.Button(preview_nav, text="◀", width=3,
+                   command=lambda: self.change_preview_page(-1)).pack(side='left')
+        self.preview_label = tk.Label(preview_nav, text="Nessuna immagine", fg='#7f8c8d')
+        self.preview_label.pack(side='left', padx=10)
+        ttk.Button(preview_nav, text="▶", width=3,
+                   command=lambda: self.change_preview_page(1)).pack(side='left')
+        ttk.Button(preview_nav, text="⟳", width=3,
+                   command=lambda: self.refresh_preview_images(clear_cache=True)).pack(side='right')
+
+        self.preview_canvas = tk.Canvas(preview_frame, width=PREVIEW_WIDTH,
+                                        height=int(PREVIEW_WIDTH * PAGE_H / PAGE_W), bg='#bdc3c7',
+                                        highlightthickness=0)
+        self.preview_canvas.pack(pady=(10, 0))
+        self.refresh_preview_images()
 
         # === SEZIONE INFO ===
         info_frame = ttk.LabelFrame(main, text="ℹ️ Informazioni", padding=15)
@@ -408,6 +2741,17 @@ class CardPrinterApp:
                                        style='Accent.TButton')
         self.generate_btn.pack(side='left', fill='x', expand=True, padx=(0, 5))
 
+        self.draft_btn = ttk.Button(buttons_frame, text="📝 Bozza",
+                                    command=self.draft_pdf_thread)
+        self.draft_btn.pack(side='left', padx=5)
+
+        ttk.Button(buttons_frame, text="🔍 Verifica",
+                   command=self.preflight_thread).pack(side='left', padx=5)
+
+        self.watch_btn = ttk.Button(buttons_frame, text="👁️ Avvia Watch",
+                                    command=self.toggle_watch)
+        self.watch_btn.pack(side='left', fill='x', expand=True, padx=5)
+
         ttk.Button(buttons_frame, text="💾 Salva Impostazioni",
                    command=self.save_config).pack(side='left', fill='x', expand=True, padx=5)
 
@@ -444,13 +2788,60 @@ class CardPrinterApp:
         self.update_info()
 
     def update_mode_info(self):
-        if self.include_back_var.get():
+        if self.include_back_var.get() and self.card_backs_var.get():
+            self.mode_info.config(text="✓ Stampa duplex: ogni carta avrà il suo retro (logo dove manca)",
+                                  fg='#27ae60')
+        elif self.include_back_var.get():
             self.mode_info.config(text="✓ Stampa duplex: ogni foglio avrà fronte (carte) e retro (logo)",
                                   fg='#27ae60')
         else:
             self.mode_info.config(text="○ Solo fronte: verranno stampate solo le carte (senza retro)",
                                   fg='#e67e22')
 
+    def get_calibration(self):
+        try:
+            return {key: var.get() for key, var in self.calibration_vars.items()}
+        except tk.TclError:
+            return dict(CALIBRATION_DEFAULT)
+
+    def load_calibration_profile(self):
+        profile = normalize_calibration(self.calibration_profiles.get(self.calibration_profile_var.get()))
+        for key, var in self.calibration_vars.items():
+            var.set(profile[key])
+
+    def save_calibration_profile(self):
+        name = self.calibration_profile_var.get().strip()
+        if not name:
+            messagebox.showerror("Errore", "Scrivi un nome per il profilo della stampante!")
+            return
+        self.calibration_profiles[name] = normalize_calibration(self.get_calibration())
+        self.calibration_combo.config(values=sorted(self.calibration_profiles))
+        self.save_config()
+
+    def delete_calibration_profile(self):
+        name = self.calibration_profile_var.get()
+        if name in self.calibration_profiles:
+            del self.calibration_profiles[name]
+            self.calibration_combo.config(values=sorted(self.calibration_profiles))
+            self.calibration_profile_var.set("")
+            self.load_calibration_profile()
+
+    def generate_calibration_sheet(self):
+        file = filedialog.asksaveasfilename(
+            title="Salva foglio di calibrazione",
+            defaultextension=".pdf",
+            initialfile="calibrazione.pdf",
+            filetypes=[("PDF", "*.pdf")]
+        )
+        if not file:
+            return
+        try:
+            success, message = make_calibration_sheet(file, self.card_width_var.get(), self.card_height_var.get(),
+                                                      self.gap_var.get(), self.get_calibration())
+            messagebox.showinfo("🎯 Calibrazione", message)
+        except Exception as e:
+            messagebox.showerror("Errore", f"Impossibile creare il foglio di test: {e}")
+
     def update_dpi_label(self, value):
         self.dpi_label.config(text=f"{int(float(value))} DPI")
         self.update_info()
@@ -486,6 +2877,116 @@ class CardPrinterApp:
         except:
             pass
 
+    def refresh_preview_images(self, clear_cache=False):
+        if self.preview_canvas is None:
+            return
+        if clear_cache:
+            self.preview_thumbs.clear()
+            self.preview_photos.clear()
+        folder = self.image_folder.get()
+        scan_options = self.get_scan_options()
+        card_backs = self.card_backs_var.get()
+        back_manifest = self.back_manifest_path.get()
+
+        def worker():
+            images = []
+            if folder and os.path.isdir(folder):
+                try:
+                    images = list_image_files(folder, **scan_options)
+                    if card_backs:
+                        manifest = load_back_manifest(back_manifest) if back_manifest else None
+                        images, _ = split_back_images(images, manifest)
+                except (OSError, ValueError):
+                    pass
+            self.root.after(0, lambda: self.set_preview_images(images))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def set_preview_images(self, images):
+        self.preview_images = images
+        self.preview_page = 0
+        self.schedule_preview()
+
+    def change_preview_page(self, delta):
+        self.preview_page = max(0, self.preview_page + delta)
+        self.schedule_preview()
+
+    def schedule_preview(self):
+        if self.preview_canvas is None:
+            return
+        if self.preview_after:
+            self.root.after_cancel(self.preview_after)
+        self.preview_after = self.root.after(20, self.draw_preview)
+
+    def load_preview_thumbnails(self, paths):
+        for path in paths:
+            try:
+                self.preview_thumbs[path] = make_preview_thumbnail(path)
+                # La miniatura è già decodificata: il colore medio per l'ordinamento costa pochissimo
+                get_library_index().card_color(path, self.preview_thumbs[path])
+            except Exception as e:
+                print(f"⚠️ Errore anteprima {path}: {e}")
+                self.preview_thumbs[path] = None
+        self.preview_loading = False
+        self.root.after(0, self.schedule_preview)
+
+    def draw_preview(self):
+        self.preview_after = None
+        canvas = self.preview_canvas
+        canvas.delete('all')
+        try:
+            card_w = self.card_width_var.get()
+            card_h = self.card_height_var.get()
+            gap = self.gap_var.get()
+        except tk.TclError:
+            return  # valore incompleto mentre l'utente scrive
+        if card_w <= 0 or card_h <= 0:
+            return
+
+        scale = PREVIEW_WIDTH / PAGE_W
+        canvas.create_rectangle(0, 0, PAGE_W * scale, PAGE_H * scale, fill='white', outline='')
+
+        positions = compute_grid_positions(PAGE_W, PAGE_H, card_w, card_h, gap)
+        slots = len(positions)
+        pages = max(1, -(-len(self.preview_images) // slots))
+        self.preview_page = min(self.preview_page, pages - 1)
+        chunk = self.preview_images[self.preview_page * slots:(self.preview_page + 1) * slots]
+        w_px = max(1, round(card_w * scale))
+        h_px = max(1, round(card_h * scale))
+
+        missing = []
+        for slot_idx, (x, y) in enumerate(positions):
+            x0, y0 = x * scale, y * scale
+            path = chunk[slot_idx] if slot_idx < len(chunk) else None
+            if path is None:
+                canvas.create_rectangle(x0, y0, x0 + w_px, y0 + h_px, outline='#bdc3c7', dash=(2, 2))
+                continue
+            if path not in self.preview_thumbs:
+                missing.append(path)
+                canvas.create_rectangle(x0, y0, x0 + w_px, y0 + h_px, fill='#ecf0f1', outline='#95a5a6')
+                continue
+            thumb = self.preview_thumbs[path]
+            if thumb is None:
+                canvas.create_rectangle(x0, y0, x0 + w_px, y0 + h_px, fill='#fadbd8', outline='#c0392b')
+                continue
+            key = (path, w_px, h_px)
+            if key not in self.preview_photos:
+                self.preview_photos[key] = tk.PhotoImage(data=preview_thumbnail_data(thumb, w_px, h_px))
+            canvas.create_image(x0, y0, anchor='nw', image=self.preview_photos[key])
+
+        # Le PhotoImage delle dimensioni precedenti non servono più
+        for key in [k for k in self.preview_photos if k[1:] != (w_px, h_px)]:
+            del self.preview_photos[key]
+
+        if self.preview_images:
+            self.preview_label.config(text=f"Foglio {self.preview_page + 1}/{pages} - {slots} carte per foglio")
+        else:
+            self.preview_label.config(text="Nessuna immagine")
+
+        if missing and not self.preview_loading:
+            self.preview_loading = True
+            threading.Thread(target=self.load_preview_thumbnails, args=(missing,), daemon=True).start()
+
     def browse_images(self):
         folder = filedialog.askdirectory(title="Seleziona cartella immagini")
         if folder:
@@ -502,6 +3003,31 @@ class CardPrinterApp:
         if file:
             self.logo_path.set(file)
 
+    def browse_manifest(self):
+        file = filedialog.askopenfilename(
+            title="Seleziona manifest retro",
+            filetypes=[("JSON", "*.json")]
+        )
+        if file:
+            self.back_manifest_path.set(file)
+
+    def browse_decklist(self):
+        file = filedialog.askopenfilename(
+            title="Seleziona lista del mazzo",
+            filetypes=[("Testo", "*.txt"), ("Tutti i file", "*.*")]
+        )
+        if file:
+            self.decklist_path.set(file)
+            self.order_var.set("decklist")
+
+    def browse_cmyk_profile(self):
+        file = filedialog.askopenfilename(
+            title="Seleziona profilo ICC CMYK",
+            filetypes=[("Profili ICC", "*.icc *.icm")]
+        )
+        if file:
+            self.cmyk_profile_path.set(file)
+
     def browse_output(self):
         file = filedialog.asksaveasfilename(
             title="Salva PDF come",
@@ -516,22 +3042,90 @@ class CardPrinterApp:
         self.progress_label.config(text=message)
         self.root.update_idletasks()
 
+    def get_scan_options(self):
+        def split_globs(text):
+            return [p.strip() for p in text.split(';') if p.strip()]
+
+        recursive = self.recursive_var.get()
+        sniff = self.sniff_var.get()
+        return {
+            'recursive': recursive,
+            'include': split_globs(self.include_globs_var.get()),
+            'exclude': split_globs(self.exclude_globs_var.get()),
+            'sniff': sniff,
+            # L'indice serve per le librerie grandi: cartelle annidate o riconoscimento dal contenuto
+            'use_index': recursive or sniff,
+            'order': self.order_var.get(),
+            'decklist': self.decklist_path.get() or None,
+        }
+
+    def run_make_pdf(self, report=None, **overrides):
+        if report is None:
+            report = {}
+        folder_key = os.path.abspath(self.image_folder.get())
+        params = dict(
+            image_folder=self.image_folder.get(),
+            output_pdf=self.output_path.get(),
+            logo_path=self.logo_path.get(),
+            progress_callback=self.progress_callback,
+            dpi=self.dpi_var.get(),
+            card_w=self.card_width_var.get(),
+            card_h=self.card_height_var.get(),
+            gap=self.gap_var.get(),
+            show_crop_marks=self.show_crop_var.get(),
+            stamp_numbers=self.stamp_numbers_var.get(),
+            workers=self.workers_var.get(),
+            include_back=self.include_back_var.get(),
+            pdf_format=self.pdf_format_var.get(),
+            back_calibration=self.get_calibration(),
+            card_backs=self.card_backs_var.get(),
+            back_manifest=self.back_manifest_path.get() or None,
+            cache_dir=CACHE_DIR if self.use_cache_var.get() else None,
+            scan_options=self.get_scan_options(),
+            preflight=self.preflight_var.get(),
+            report=report,
+            cmyk_profile=self.cmyk_profile_path.get() or None,
+            alpha_background=self.alpha_background_var.get(),
+            compression_level=self.compression_var.get(),
+            executor=self.pool,
+            auto_workers=self.auto_workers_var.get(),
+            workers_hint=self.auto_workers_by_folder.get(folder_key),
+            volume_sheets=self.volume_sheets_var.get(),
+            volume_max_mb=self.volume_max_mb_var.get(),
+            prefetch_mb=self.prefetch_mb_var.get(),
+            temp_root=self.temp_root_var.get() or None,
+            failed_policy=self.failed_policy_var.get()
+        )
+        params.update(overrides)
+        report["startup"] = dict(self.startup_report)
+        with self.generation_lock:
+            result = make_pdf(**params)
+        # Le bozze leggono quasi solo dalla cache: il loro ottimo non vale per la stampa finale
+        tuning = report.get("workers", {})
+        if tuning.get("auto") and tuning.get("batches") and not params.get("draft"):
+            self.auto_workers_by_folder[folder_key] = tuning["best"]
+            # La misura vale anche alle prossime aperture: si salva subito, senza toccare le altre impostazioni
+            self.update_config('auto_workers_by_folder', dict(self.auto_workers_by_folder))
+        return result
+
     def generate_pdf_worker(self):
         try:
-            success, message = make_pdf(
-                self.image_folder.get(),
-                self.output_path.get(),
-                self.logo_path.get(),
-                self.progress_callback,
-                self.dpi_var.get(),
-                self.card_width_var.get(),
-                self.card_height_var.get(),
-                self.gap_var.get(),
-                self.show_crop_var.get(),
-                self.workers_var.get(),
-                self.include_back_var.get(),
-                self.pdf_format_var.get()
-            )
+            report = {}
+            success, message = self.run_make_pdf(report)
+
+            low_dpi = report.get("preflight", {}).get("low_dpi")
+            if success and low_dpi:
+                message += f"\n\n⚠️ {len(low_dpi)} immagini sotto {MIN_EFFECTIVE_DPI} DPI effettivi"
+            tuning = report.get("workers", {})
+            if success and tuning.get("auto") and tuning.get("batches"):
+                message += f"\n\n⚙️ Thread automatici: {tuning['best']} ({len(tuning['batches'])} misure)"
+            if success and report.get("decode_recovered"):
+                message += f"\n🩹 {report['decode_recovered']} immagini lette con i decoder di riserva"
+            workspace = report.get("workspace", {})
+            if success and workspace.get("bytes"):
+                message += f"\n💽 File temporanei: {workspace['bytes'] / 1024 / 1024:.1f} MB (già eliminati)"
+            elif success and workspace.get("cache_dir"):
+                message += f"\n💽 Immagini elaborate nella cache ({workspace['cache_dir']}), non nella cartella temporanei"
 
             if success:
                 self.root.after(0, lambda: messagebox.showinfo("✅ Successo!", message))
@@ -544,21 +3138,108 @@ class CardPrinterApp:
         finally:
             self.root.after(0, lambda: self.generate_btn.config(state='normal'))
 
-    def generate_pdf_thread(self):
+    def preflight_worker(self):
+        try:
+            images = list_image_files(self.image_folder.get(), **self.get_scan_options())
+            if self.card_backs_var.get():
+                back_manifest = self.back_manifest_path.get()
+                manifest = load_back_manifest(back_manifest) if back_manifest else None
+                images, backs_by_stem = split_back_images(images, manifest)
+                images += sorted(set(find_card_backs(images, backs_by_stem, manifest)) - {None})
+            start = time.perf_counter()
+            report = preflight_images(images, self.card_width_var.get(), self.card_height_var.get(),
+                                      self.workers_var.get(), executor=self.pool)
+            message = format_preflight_report(report) + f"\n\n⏱️ {time.perf_counter() - start:.2f} s"
+            self.root.after(0, lambda: messagebox.showinfo("🔍 Pre-flight", message))
+        except Exception as e:
+            error_msg = f"Errore durante il pre-flight:\n{str(e)}"
+            self.root.after(0, lambda: messagebox.showerror("❌ Errore", error_msg))
+
+    def preflight_thread(self):
         if not self.image_folder.get():
             messagebox.showerror("Errore", "Seleziona la cartella immagini!")
             return
-        if self.include_back_var.get() and not self.logo_path.get():
+        threading.Thread(target=self.preflight_worker, daemon=True).start()
+
+    def validate_inputs(self):
+        if not self.image_folder.get():
+            messagebox.showerror("Errore", "Seleziona la cartella immagini!")
+            return False
+        if self.include_back_var.get() and not self.card_backs_var.get() and not self.logo_path.get():
             messagebox.showerror("Errore", "Seleziona il logo per il retro o disabilita la modalità duplex!")
-            return
+            return False
         if not self.output_path.get():
             messagebox.showerror("Errore", "Specifica il file PDF di output!")
+            return False
+        return True
+
+    def draft_pdf_worker(self):
+        try:
+            draft_pdf = draft_output_path(self.output_path.get())
+            success, message = self.run_make_pdf(output_pdf=draft_pdf, draft=True)
+            if not success:
+                self.root.after(0, lambda: messagebox.showerror("❌ Errore", message))
+                return
+            self.root.after(0, lambda: messagebox.showinfo("📝 Bozza pronta", f"{message}\n\n{draft_pdf}"))
+
+            if self.final_after_draft_var.get():
+                # Il pre-flight è già stato fatto dalla bozza; la lista immagini arriva dall'indice
+                success, message = self.run_make_pdf(preflight=False)
+                if success:
+                    self.root.after(0, lambda: messagebox.showinfo("✅ PDF finale pronto", message))
+                else:
+                    self.root.after(0, lambda: messagebox.showerror("❌ Errore", message))
+        except Exception as e:
+            error_msg = f"Errore durante la generazione:\n{str(e)}"
+            self.root.after(0, lambda: messagebox.showerror("❌ Errore", error_msg))
+        finally:
+            self.root.after(0, lambda: self.generate_btn.config(state='normal'))
+            self.root.after(0, lambda: self.draft_btn.config(state='normal'))
+
+    def draft_pdf_thread(self):
+        if not self.validate_inputs():
+            return
+        self.generate_btn.config(state='disabled')
+        self.draft_btn.config(state='disabled')
+        threading.Thread(target=self.draft_pdf_worker, daemon=True).start()
+
+    def generate_pdf_thread(self):
+        if not self.validate_inputs():
             return
 
         self.generate_btn.config(state='disabled')
         thread = threading.Thread(target=self.generate_pdf_worker, daemon=True)
         thread.start()
 
+    def watch_regenerate(self):
+        self.root.after(0, lambda: self.generate_btn.config(state='disabled'))
+        try:
+            success, message = self.run_make_pdf()
+            status = f"👁️ {time.strftime('%H:%M:%S')} - {message}"
+        except Exception as e:
+            status = f"👁️ Errore watch: {e}"
+        finally:
+            self.root.after(0, lambda: self.generate_btn.config(state='normal'))
+        self.root.after(0, lambda: self.progress_label.config(text=status))
+
+    def toggle_watch(self):
+        if self.watcher and self.watcher.is_running():
+            self.watcher.stop()
+            self.watcher = None
+            self.watch_btn.config(text="👁️ Avvia Watch")
+            self.progress_label.config(text="Watch fermato")
+            return
+        if not self.validate_inputs():
+            return
+        if not self.use_cache_var.get():
+            # Senza cache ogni modifica rielaborerebbe l'intero mazzo
+            self.use_cache_var.set(True)
+        self.watcher = FolderWatcher(self.image_folder.get(), self.watch_regenerate,
+                                     scan_options=self.get_scan_options())
+        self.watcher.start()
+        self.watch_btn.config(text="⏹️ Ferma Watch")
+        self.progress_label.config(text=f"👁️ Watch attivo su {self.image_folder.get()}")
+
     def save_config(self):
         config = {
             'dpi': self.dpi_var.get(),
@@ -566,11 +3247,35 @@ class CardPrinterApp:
             'card_height': self.card_height_var.get(),
             'gap': self.gap_var.get(),
             'show_crop': self.show_crop_var.get(),
+            'stamp_numbers': self.stamp_numbers_var.get(),
             'include_back': self.include_back_var.get(),
+            'card_backs': self.card_backs_var.get(),
+            'use_cache': self.use_cache_var.get(),
+            'preflight': self.preflight_var.get(),
+            'final_after_draft': self.final_after_draft_var.get(),
+            'cmyk_profile': self.cmyk_profile_path.get(),
+            'alpha_background': self.alpha_background_var.get(),
+            'compression_level': self.compression_var.get(),
+            'volume_sheets': self.volume_sheets_var.get(),
+            'volume_max_mb': self.volume_max_mb_var.get(),
+            'prefetch_mb': self.prefetch_mb_var.get(),
+            'temp_root': self.temp_root_var.get(),
+            'failed_policy': self.failed_policy_var.get(),
+            'recursive': self.recursive_var.get(),
+            'sniff_formats': self.sniff_var.get(),
+            'order': self.order_var.get(),
+            'decklist': self.decklist_path.get(),
+            'include_globs': self.include_globs_var.get(),
+            'exclude_globs': self.exclude_globs_var.get(),
+            'back_manifest': self.back_manifest_path.get(),
             'workers': self.workers_var.get(),
+            'auto_workers': self.auto_workers_var.get(),
+            'auto_workers_by_folder': self.auto_workers_by_folder,
             'pdf_format': self.pdf_format_var.get(),
             'last_logo': self.logo_path.get(),
-            'last_folder': self.image_folder.get()
+            'last_folder': self.image_folder.get(),
+            'calibration_profile': self.calibration_profile_var.get(),
+            'calibration_profiles': self.calibration_profiles
         }
         try:
             with open(CONFIG_FILE, 'w') as f:
@@ -579,6 +3284,20 @@ class CardPrinterApp:
         except Exception as e:
             messagebox.showerror("Errore", f"Impossibile salvare: {e}")
 
+    def update_config(self, key, value):
+        """Aggiorna una sola voce del file di configurazione, senza messaggi (chiamata anche dai thread di lavoro)"""
+        with self.config_lock:
+            try:
+                config = {}
+                if os.path.exists(CONFIG_FILE):
+                    with open(CONFIG_FILE, 'r') as f:
+                        config = json.load(f)
+                config[key] = value
+                with open(CONFIG_FILE, 'w') as f:
+                    json.dump(config, f, indent=2)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Impossibile salvare {key}: {e}")
+
     def load_config(self):
         try:
             if os.path.exists(CONFIG_FILE):
@@ -589,11 +3308,36 @@ class CardPrinterApp:
                 self.card_height_var.set(config.get('card_height', 86))
                 self.gap_var.set(config.get('gap', 5))
                 self.show_crop_var.set(config.get('show_crop', True))
+                self.stamp_numbers_var.set(config.get('stamp_numbers', False))
                 self.include_back_var.set(config.get('include_back', True))
+                self.card_backs_var.set(config.get('card_backs', False))
+                self.use_cache_var.set(config.get('use_cache', True))
+                self.preflight_var.set(config.get('preflight', True))
+                self.final_after_draft_var.set(config.get('final_after_draft', True))
+                self.cmyk_profile_path.set(config.get('cmyk_profile', ''))
+                self.alpha_background_var.set(config.get('alpha_background', ALPHA_BACKGROUND_DEFAULT))
+                self.compression_var.set(config.get('compression_level', COMPRESSION_LEVEL_DEFAULT))
+                self.volume_sheets_var.set(config.get('volume_sheets', 0))
+                self.volume_max_mb_var.set(config.get('volume_max_mb', 0))
+                self.prefetch_mb_var.set(config.get('prefetch_mb', PREFETCH_MB_DEFAULT))
+                self.temp_root_var.set(config.get('temp_root', ''))
+                self.failed_policy_var.set(config.get('failed_policy', FAILED_CARD_POLICY_DEFAULT))
+                self.recursive_var.set(config.get('recursive', False))
+                self.sniff_var.set(config.get('sniff_formats', False))
+                self.order_var.set(config.get('order', 'path'))
+                self.decklist_path.set(config.get('decklist', ''))
+                self.include_globs_var.set(config.get('include_globs', ''))
+                self.exclude_globs_var.set(config.get('exclude_globs', ''))
+                self.back_manifest_path.set(config.get('back_manifest', ''))
                 self.workers_var.set(config.get('workers', os.cpu_count() or 4))
+                self.auto_workers_var.set(config.get('auto_workers', False))
+                self.auto_workers_by_folder = config.get('auto_workers_by_folder', {})
                 self.pdf_format_var.set(config.get('pdf_format', 'PDF/X-4 (Stampa con trasparenze)'))
                 self.logo_path.set(config.get('last_logo', ''))
                 self.image_folder.set(config.get('last_folder', ''))
+                self.calibration_profiles = config.get('calibration_profiles', {})
+                self.calibration_profile_var.set(config.get('calibration_profile', ''))
+                self.load_calibration_profile()
         except:
             pass
 
@@ -628,6 +3372,24 @@ Creato per la community di Vanguard! 🃏
 
 # =============== AVVIO APP ===============
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = CardPrinterApp(root)
-    root.mainloop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Card Printer Pro")
+    parser.add_argument("--serve", action="store_true", help="avvia il servizio di rendering HTTP invece della GUI")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--jobs", type=int, default=1, help="job elaborati contemporaneamente")
+    parser.add_argument("--workers", type=int, default=None, help="thread di elaborazione condivisi")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="apre la finestra, stampa i tempi di avvio in JSON ed esce")
+    args = parser.parse_args()
+
+    if args.serve:
+        server = RenderService(workers=args.workers, concurrent_jobs=args.jobs).serve(args.host, args.port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+    else:
+        root = tk.Tk()
+        app = CardPrinterApp(root, measure_startup=args.measure_startup)
+        root.mainloop()
+        app.pool.shutdown()
\ No newline at end of file
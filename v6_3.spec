@@ -1,38 +1,98 @@
 # -*- mode: python ; coding: utf-8 -*-
+# Build predefinito: cartella (onedir) in dist/v6_3, avvio senza estrazione in una cartella temporanea.
+# CARD_PRINTER_ONEFILE=1 produce il vecchio exe singolo, utile per confrontare i tempi con measure_startup.py.
+# VIPS_HOME=<cartella vips-dev> aggiunge le DLL di libvips se non arrivano da pyvips-binary.
+import importlib.util
+import os
+import sys
+from glob import glob
 
+# .strip(): con `set CARD_PRINTER_ONEFILE=1 && ...` cmd include lo spazio prima di && nel valore
+ONEFILE = os.environ.get("CARD_PRINTER_ONEFILE", "").strip() == "1"
+
+# DLL di libvips: pyvips-binary installa il modulo _libvips e le librerie in pyvips_binary.libs accanto
+# (non un pacchetto pyvips_binary da cui collect_dynamic_libs possa raccoglierle); altrimenti da VIPS_HOME\bin.
+# Su Windows le DLL vanno nella cartella dell'exe, che è nel percorso di ricerca; su Linux _libvips le cerca
+# in pyvips_binary.libs accanto a sé (RPATH $ORIGIN).
+binaries = []
+libvips_spec = importlib.util.find_spec("_libvips")
+if libvips_spec and libvips_spec.origin:
+    libs_dir = os.path.join(os.path.dirname(libvips_spec.origin), "pyvips_binary.libs")
+    dest = "." if sys.platform == "win32" else "pyvips_binary.libs"
+    binaries += [(lib, dest) for lib in glob(os.path.join(libs_dir, "*"))]
+vips_home = os.environ.get("VIPS_HOME")
+if vips_home:
+    binaries += [(dll, ".") for dll in glob(os.path.join(vips_home, "bin", "*.dll"))]
+
+# Moduli trascinati dall'ambiente di sviluppo ma mai usati dall'app
+excludes = [
+    "numpy", "scipy", "pandas", "matplotlib", "cv2", "IPython", "jupyter_client", "notebook",
+    "PyQt5", "PyQt6", "PySide2", "PySide6",
+    "setuptools", "pkg_resources", "_distutils_hack", "wheel", "pip",
+    "xmlrpc", "pydoc", "pydoc_data", "doctest", "lib2to3", "sqlite3", "tomllib",
+]
 
 a = Analysis(
     ['v6_3.py'],
     pathex=[],
-    binaries=[],
+    binaries=binaries,
     datas=[],
-    hiddenimports=[],
+    hiddenimports=["_libvips"],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=excludes,
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='v6_3',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=True,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='v6_3',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='v6_3',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        # UPX costringe a decomprimere ogni DLL a ogni avvio
+        upx=False,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='v6_3',
+    )